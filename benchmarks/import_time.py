@@ -0,0 +1,95 @@
+"""
+Import time of the semiempy modules, each measured in fresh interpreters,
+and the optional heavy dependencies each import pulls in
+
+Usage:
+    python import_time.py -o import_times.json --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+semiempy_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semiempy")
+
+# what a short run needs, from the lightest to the full drivers
+targets = [
+    "utils.molecule",
+    "basis.minimal_gaussian_basis_no_core",
+    "integrals.numpy_integrals",
+    "methods.CNDO",
+    "drivers.batch",
+    "drivers.trajectory",
+    "integrals.gaussian_integrals"
+]
+# optional dependencies that should only load when their feature is used
+heavy_modules = ["cclib", "pyscf", "pyarrow", "scipy.optimize"]
+
+probe = """
+import sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def import_time(target, repeat=5):
+    """
+    Returns the fastest import time of a module in seconds over repeat
+    fresh interpreters and the heavy modules it loaded
+    """
+    times = []
+    loaded = []
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, "-c", probe.format(path=semiempy_dir, target=target, heavy=heavy_modules)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1:]
+        lines = out.stdout.splitlines()
+        times.append(float(lines[-2]))
+        loaded = lines[-1].split()
+    return min(times), loaded
+
+
+def interpreter_time(repeat=5):
+    """
+    Returns the fastest startup time of a bare interpreter with numpy
+    """
+    times = []
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, "-c", probe.format(path=semiempy_dir, target="numpy", heavy=[])],
+                             capture_output=True, text=True)
+        times.append(float(out.stdout.splitlines()[-2]))
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the import time of semiempy modules.')
+    parser.add_argument('-o', '--output', default=None, help='JSON results file')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('targets', nargs='*', default=targets)
+    args = parser.parse_args(argv)
+
+    results = {'numpy': interpreter_time(args.repeat)}
+    print('{:>40} {:>10}  {}'.format('module', 'time (ms)', 'heavy modules loaded'))
+    print('{:>40} {:>10.1f}'.format('numpy', 1e3*results['numpy']))
+    for target in args.targets:
+        elapsed, loaded = import_time(target, args.repeat)
+        if elapsed is None:
+            print('{:>40} {:>10}  {}'.format(target, 'failed', ' '.join(loaded)))
+            results[target] = None
+            continue
+        results[target] = elapsed
+        print('{:>40} {:>10.1f}  {}'.format(target, 1e3*elapsed, ' '.join(loaded)))
+        results[target + ':loaded'] = loaded
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
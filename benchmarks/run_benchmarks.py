@@ -0,0 +1,242 @@
+"""
+Benchmarks of integral setup, SCF iterations and total runtime on
+size-scaled water clusters, linear alkanes and graphene flakes
+
+Usage:
+    python run_benchmarks.py -o results.json
+    python run_benchmarks.py --systems water alkane --repeat 3 --compare baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import scipy
+from systems import systems, default_sizes, make_molecule
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from methods.CNDO import CNDO, integral_backends
+
+# metrics compared against a baseline and fitted for scaling exponents
+timed_metrics = ['time_integrals', 'time_H_core', 'time_per_iteration', 'time_total']
+
+
+def run_cndo(mol, integral_backend="numpy", iteration_max=30):
+    """
+    Builds the basis and runs CNDO silently, returns the finished method
+    """
+    bas = MinimalNoCore(mol, num_gaussians=3)
+    calc = CNDO(mol, bas, integral_backend=integral_backend)
+    calc.observers = []
+    calc.iteration_max = iteration_max
+    calc.run()
+    return calc
+
+
+def benchmark(system, size, integral_backend="numpy", iteration_max=30, repeat=1, memory=True):
+    """
+    Runs CNDO on one generated system and returns its timings
+
+    Parameters
+    ----------
+    system : string
+        name in systems.systems
+    size : int
+        size parameter of the system
+    integral_backend : string
+        CNDO integral backend
+    iteration_max : int
+        SCF iterations at most. Timings per iteration do not need the SCF
+        to converge.
+    repeat : int
+        number of runs. The fastest time of each metric is kept.
+    memory : bool
+        measure the peak memory with tracemalloc in one more, untimed run.
+        Tracing slows the Python heavy phases down too much to time them
+        at the same time.
+
+    Returns
+    -------
+    result : dict
+        timings in seconds and peak memory in bytes
+    """
+    mol = make_molecule(system, size)
+    best = None
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        calc = run_cndo(mol, integral_backend, iteration_max)
+        time_total = time.perf_counter() - start_time
+        phases = calc.stats.phases
+        scf_phases = ['form_fock', 'calculate_E_elec', 'accelerate_fock', 'diag_fock', 'form_DM', 'check_stop']
+        result = {
+            'system': system,
+            'size': size,
+            'integral_backend': integral_backend,
+            'n_atom': mol.n_atom,
+            'n_func': calc.bas.n_func,
+            'iterations': calc.iteration_num,
+            'converged': bool(calc.converged),
+            'E_total': float(calc.E_total),
+            'time_integrals': phases['overlap']['time'] + phases['two_electron']['time'],
+            'time_H_core': phases['H_core']['time'],
+            'time_per_iteration': sum(phases[p]['time'] for p in scf_phases if p in phases) / calc.iteration_num,
+            'time_total': time_total,
+            'peak_memory_bytes': None,
+            'peak_array_bytes': calc.stats.peak_array_bytes,
+            'phases': phases
+        }
+        if best is None:
+            best = result
+        else:
+            for key in timed_metrics:
+                best[key] = min(best[key], result[key])
+    if memory:
+        tracemalloc.start()
+        run_cndo(mol, integral_backend, iteration_max)
+        best['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best
+
+
+def scaling_exponents(results):
+    """
+    Fits time = a n_func^k for each system and metric
+
+    Returns
+    -------
+    exponents : dict
+        {system: {metric: k}} for the systems with at least two sizes
+    """
+    exponents = {}
+    for system in sorted(set(row['system'] for row in results)):
+        rows = [row for row in results if row['system'] == system]
+        if len(rows) < 2:
+            continue
+        n = np.log([row['n_func'] for row in rows])
+        exponents[system] = {}
+        for key in timed_metrics:
+            t = np.array([row[key] for row in rows])
+            # very fast phases are dominated by timer noise
+            usable = t > 1e-5
+            if np.sum(usable) >= 2:
+                exponents[system][key] = float(np.polyfit(n[usable], np.log(t[usable]), 1)[0])
+    return exponents
+
+
+def compare(results, baseline, tolerance=0.25, min_time=1e-2):
+    """
+    Returns the metrics that are slower than in a baseline results file
+
+    Parameters
+    ----------
+    results : list
+        rows from benchmark
+    baseline : dict
+        contents of a previous results file
+    tolerance : float
+        allowed relative slowdown
+    min_time : float
+        metrics faster than this many seconds in the baseline are ignored
+
+    Returns
+    -------
+    regressions : list
+        (system, size, integral_backend, metric, baseline time, new time)
+    """
+    old = {(row['system'], row['size'], row['integral_backend']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        key = (row['system'], row['size'], row['integral_backend'])
+        if key not in old:
+            continue
+        for metric in timed_metrics:
+            t_old = old[key][metric]
+            if t_old > min_time and row[metric] > (1.0 + tolerance)*t_old:
+                regressions.append(key + (metric, t_old, row[metric]))
+    return regressions
+
+
+def environment():
+    """
+    Returns the versions and machine the benchmarks ran on
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark semiempy on size-scaled systems.')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='results file')
+    parser.add_argument('--systems', nargs='+', default=sorted(systems), choices=sorted(systems))
+    parser.add_argument('--sizes', nargs='+', type=int, default=None,
+                        help='sizes of every system instead of the defaults')
+    parser.add_argument('--max-func', type=int, default=1000, help='skip systems with more basis functions')
+    parser.add_argument('--integral-backend', nargs='+', default=['numpy'], choices=sorted(integral_backends))
+    parser.add_argument('--iteration-max', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the extra run measuring the peak memory with tracemalloc')
+    parser.add_argument('--compare', default=None, help='baseline results file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    results = []
+    print('{:>10} {:>5} {:>8} {:>6} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'system', 'size', 'backend', 'n_atom', 'n_func', 'integrals', 'H_core', 'per iter', 'total', 'peak MB'))
+    for system in args.systems:
+        for size in args.sizes or default_sizes[system]:
+            for backend in args.integral_backend:
+                n_func = MinimalNoCore(make_molecule(system, size), num_gaussians=3).n_func
+                if n_func > args.max_func:
+                    continue
+                row = benchmark(system, size, backend, args.iteration_max, args.repeat, not args.no_memory)
+                results.append(row)
+                peak_memory = row['peak_memory_bytes'] or row['peak_array_bytes']
+                print('{:>10} {:>5} {:>8} {:>6} {:>6} {:>10.4f} {:>10.4f} {:>10.4f} {:>10.4f} {:>10.1f}'.format(
+                    system, size, backend, row['n_atom'], row['n_func'], row['time_integrals'],
+                    row['time_H_core'], row['time_per_iteration'], row['time_total'],
+                    peak_memory/2**20))
+                sys.stdout.flush()
+
+    exponents = {}
+    for backend in args.integral_backend:
+        exponents[backend] = scaling_exponents([row for row in results if row['integral_backend'] == backend])
+    print('\nScaling exponents in n_func:')
+    for backend, by_system in exponents.items():
+        for system, by_metric in by_system.items():
+            print('  {:>8} {:>10}: '.format(backend, system)
+                  + '  '.join('{}={:.2f}'.format(key, k) for key, k in by_metric.items()))
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results, 'scaling': exponents}, f, indent=2)
+    print('Results written to {}'.format(args.output))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for system, size, backend, metric, t_old, t_new in regressions:
+            print('REGRESSION {} {} {} {}: {:.4f}s -> {:.4f}s'.format(system, size, backend, metric, t_old, t_new))
+        if regressions:
+            sys.exit(1)
+        print('No regressions against {}'.format(args.compare))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Generators of size-scaled test systems built from H, C and O
+"""
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semiempy"))
+from utils.molecule import Molecule
+
+# equilibrium water geometry of example/eqh2o.xyz
+water = (['O', 'H', 'H'],
+         np.array([[0.0000000, 0.0000000, 0.0000000],
+                   [0.7569685, 0.0000000, -0.5858752],
+                   [-0.7569685, 0.0000000, -0.5858752]]))
+
+
+def rotation(rng):
+    """
+    Returns a random rotation matrix
+    """
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    return q * np.sign(np.diag(r))
+
+
+def water_cluster(n, spacing=3.1, seed=0):
+    """
+    Returns n randomly oriented water molecules on a cubic grid
+
+    Parameters
+    ----------
+    n : int
+        number of water molecules
+    spacing : float
+        distance in angstrom between neighboring oxygens
+    seed : int
+        seed of the orientations, so each size is reproducible
+
+    Returns
+    -------
+    symb : list
+        atomic symbols
+    xyz : np.ndarray
+        coordinates in angstrom. Size: (3n, 3)
+    """
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(n**(1.0/3.0)))
+    grid = np.array([(i, j, k) for i in range(side) for j in range(side) for k in range(side)])[:n]
+    symb = []
+    xyz = []
+    for site in grid:
+        symb.extend(water[0])
+        xyz.append(water[1] @ rotation(rng).T + spacing*site)
+    return symb, np.concatenate(xyz)
+
+
+def alkane(n):
+    """
+    Returns the all-trans linear alkane CnH(2n+2)
+
+    Parameters
+    ----------
+    n : int
+        number of carbon atoms
+
+    Returns
+    -------
+    symb : list
+        atomic symbols
+    xyz : np.ndarray
+        coordinates in angstrom. Size: (3n+2, 3)
+    """
+    r_CC = 1.54
+    r_CH = 1.09
+    half_angle = np.arccos(-1.0/3.0)/2.0
+    # zigzag backbone in the xy plane
+    step = np.array([r_CC*np.sin(half_angle), r_CC*np.cos(half_angle), 0.0])
+    carbons = np.array([[i*step[0], (i % 2)*step[1], 0.0] for i in range(n)])
+    symb = ['C']*n
+    xyz = [carbons]
+    bonds = [[] for i in range(n)]
+    for i in range(n - 1):
+        bonds[i].append((carbons[i + 1] - carbons[i])/r_CC)
+        bonds[i + 1].append((carbons[i] - carbons[i + 1])/r_CC)
+    for i, C in enumerate(carbons):
+        # two hydrogens above and below the plane, pointing away from the chain
+        side = -1.0 if i % 2 == 0 else 1.0
+        directions = [np.array([0.0, side*np.cos(half_angle), z*np.sin(half_angle)]) for z in (-1.0, 1.0)]
+        if n == 1:
+            directions += [np.array([x*np.sin(half_angle), np.cos(half_angle), 0.0]) for x in (-1.0, 1.0)]
+        elif i == 0 or i == n - 1:
+            # the third hydrogen of a methyl group completes the tetrahedron
+            directions.append(-(bonds[i][0] + directions[0] + directions[1]))
+        for direction in directions:
+            symb.append('H')
+            xyz.append((C + r_CH*direction)[None, :])
+    return symb, np.concatenate(xyz)
+
+
+def graphene_flake(rings):
+    """
+    Returns a hydrogen terminated hexagonal graphene flake
+
+    Parameters
+    ----------
+    rings : int
+        number of hexagon rings around the central hexagon plus one, so 1
+        gives benzene and 2 coronene
+
+    Returns
+    -------
+    symb : list
+        atomic symbols
+    xyz : np.ndarray
+        coordinates in angstrom. Size: (n_atom, 3)
+    """
+    r_CC = 1.42
+    r_CH = 1.09
+    a1 = r_CC*np.array([1.5, np.sqrt(3.0)/2.0])
+    a2 = r_CC*np.array([1.5, -np.sqrt(3.0)/2.0])
+    # the six atoms of the hexagon centered on each lattice point
+    hexagon = r_CC*np.array([[np.cos(t), np.sin(t)] for t in np.arange(6)*np.pi/3.0])
+    carbons = []
+    for i in range(-rings + 1, rings):
+        for j in range(-rings + 1, rings):
+            # hexagonal distance from the central ring
+            if max(abs(i), abs(j), abs(i + j)) < rings:
+                carbons.extend(hexagon + i*a1 + j*a2)
+    carbons = np.unique(np.round(np.array(carbons), 6), axis=0)
+    d = np.sqrt(np.sum((carbons[:, None, :] - carbons[None, :, :])**2, axis=-1))
+    bonded = (d > 0.1) & (d < 1.1*r_CC)
+    symb = ['C']*len(carbons)
+    xyz = [np.column_stack((carbons, np.zeros(len(carbons))))]
+    # hydrogens on the edge carbons, opposite to their two neighbors
+    for i in np.flatnonzero(bonded.sum(axis=1) == 2):
+        direction = 2*carbons[i] - carbons[bonded[i]].sum(axis=0)
+        direction /= np.linalg.norm(direction)
+        symb.append('H')
+        xyz.append(np.array([[*(carbons[i] + r_CH*direction), 0.0]]))
+    return symb, np.concatenate(xyz)
+
+
+systems = {
+    "water": water_cluster,
+    "alkane": alkane,
+    "graphene": graphene_flake
+}
+
+default_sizes = {
+    "water": [1, 2, 4, 8, 16, 32, 64],
+    "alkane": [2, 4, 8, 16, 32, 64],
+    "graphene": [1, 2, 3, 4, 5]
+}
+
+
+def make_molecule(system, size):
+    """
+    Returns the Molecule of a generated system
+
+    Parameters
+    ----------
+    system : string
+        name in systems
+    size : int
+        size parameter of the generator
+    """
+    symb, xyz = systems[system](size)
+    mol = Molecule()
+    mol.ftype = 'xyz'
+    mol.set_atoms(symb, xyz)
+    mol.calculate_E_nuc()
+    return mol
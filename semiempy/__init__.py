@@ -3,4 +3,5 @@ from . import basis
 from . import integrals
 from . import methods
 from . import utils
+from . import drivers
 from . import io
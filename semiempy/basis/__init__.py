@@ -1,4 +1,5 @@
 # Basis
 from .basis import Basis
+from .compact import CompactBasis
 from .gaussian import Gaussian
 from .slater import Slater
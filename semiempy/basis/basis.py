@@ -1,4 +1,5 @@
 import numpy as np
+from basis.compact import CompactBasis
 
 
 class Basis:
@@ -7,6 +8,23 @@ class Basis:
 
     Attributes
     ----------
+    compact : CompactBasis
+        struct-of-arrays copy of funcs used by the integral engines, built
+        on first use
     """
     def __init__(self, mol):
         self.mol = mol
+        self._compact = None
+
+    @property
+    def compact(self):
+        # subclasses only need to fill funcs
+        compact = getattr(self, '_compact', None)
+        if compact is None or compact.n_func != len(self.funcs):
+            compact = CompactBasis(self)
+            self._compact = compact
+        return compact
+
+    @compact.setter
+    def compact(self, compact):
+        self._compact = compact
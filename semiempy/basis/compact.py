@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class CompactBasis:
+    """
+    Struct-of-arrays copy of a basis made of gaussian functions. Functions
+    on the same center with the same angular momentum, exponents and
+    contraction coefficients (e.g. px, py, pz) are grouped into shells.
+    Primitive arrays are padded to the longest contraction with an
+    exponent of one and a coefficient of zero.
+
+    Attributes
+    ----------
+    n_func : int
+        number of basis functions
+    n_shell : int
+        number of shells
+    n_prim : int
+        maximum number of primitives per function
+    xyz : np.ndarray
+        atomic coordinates the functions are centered on. Size: (n_atom, 3)
+    elements : list
+        chemical symbols indexed by element code
+    exps : np.ndarray
+        primitive exponents of each function. Size: (n_func, n_prim)
+    coeffs : np.ndarray
+        contraction coefficients of each function. Size: (n_func, n_prim)
+    ang_mom : np.ndarray
+        cartesian angular momentum of each function. Size: (n_func, 3)
+    l : np.ndarray
+        total angular momentum of each function. Size: (n_func,)
+    center : np.ndarray
+        index of the atom each function is on. Size: (n_func,)
+    Z : np.ndarray
+        atomic number of the atom each function is on. Size: (n_func,)
+    element : np.ndarray
+        element code of the atom each function is on. Size: (n_func,)
+    func_shell : np.ndarray
+        shell each function belongs to. Size: (n_func,)
+    func_component : np.ndarray
+        cartesian component (0, 1, 2 for x, y, z) of p functions and 0 for
+        s functions. Size: (n_func,)
+    shell_first_func : np.ndarray
+        index of the first function of each shell. Size: (n_shell,)
+    shell_l, shell_center, shell_Z, shell_element : np.ndarray
+        angular momentum, atom index, atomic number and element code of
+        each shell. Size: (n_shell,)
+    shell_exps, shell_coeffs : np.ndarray
+        primitive exponents and contraction coefficients of each shell.
+        Size: (n_shell, n_prim)
+    """
+    ang_num_funcs = [1, 3]
+
+    def __init__(self, bas):
+        funcs = bas.funcs
+        self.n_func = len(funcs)
+        self.n_prim = max(len(func.exponents) for func in funcs)
+        self.xyz = np.asarray(bas.mol.xyz, dtype=float)
+        self.elements = []
+        self.exps = np.ones((self.n_func, self.n_prim))
+        self.coeffs = np.zeros((self.n_func, self.n_prim))
+        self.ang_mom = np.zeros((self.n_func, 3), dtype=np.int8)
+        self.center = np.zeros(self.n_func, dtype=np.int32)
+        self.Z = np.zeros(self.n_func, dtype=np.int16)
+        self.element = np.zeros(self.n_func, dtype=np.int16)
+        self.func_shell = np.zeros(self.n_func, dtype=np.int32)
+        self.func_component = np.zeros(self.n_func, dtype=np.int8)
+        shell_first_func = []
+        for i, func in enumerate(funcs):
+            n = len(func.exponents)
+            self.exps[i, :n] = func.exponents
+            self.coeffs[i, :n] = func.contract_coeff
+            self.ang_mom[i] = func.angular_momentum
+            self.center[i] = func.center
+            self.Z[i] = func.center_Z
+            if func.center_symb not in self.elements:
+                self.elements.append(func.center_symb)
+            self.element[i] = self.elements.index(func.center_symb)
+            l = sum(func.angular_momentum)
+            if l == 1:
+                self.func_component[i] = func.angular_momentum[1] + 2*func.angular_momentum[2]
+            # join the previous shell when it is an unfilled shell with the
+            # same center, angular momentum and primitives
+            if shell_first_func:
+                first = shell_first_func[-1]
+                if (self.center[first] == func.center
+                        and self.ang_mom[first].sum() == l
+                        and i - first < self.ang_num_funcs[l]
+                        and np.array_equal(self.exps[first], self.exps[i])
+                        and np.array_equal(self.coeffs[first], self.coeffs[i])):
+                    self.func_shell[i] = len(shell_first_func) - 1
+                    continue
+            shell_first_func.append(i)
+            self.func_shell[i] = len(shell_first_func) - 1
+        self.l = self.ang_mom.sum(axis=1).astype(np.int8)
+        self.n_shell = len(shell_first_func)
+        self.shell_first_func = np.array(shell_first_func, dtype=np.int32)
+        self.shell_l = self.l[self.shell_first_func]
+        self.shell_center = self.center[self.shell_first_func]
+        self.shell_Z = self.Z[self.shell_first_func]
+        self.shell_element = self.element[self.shell_first_func]
+        self.shell_exps = self.exps[self.shell_first_func]
+        self.shell_coeffs = self.coeffs[self.shell_first_func]
+
+    @property
+    def pos(self):
+        """
+        Position of each basis function. Size: (n_func, 3)
+        """
+        return self.xyz[self.center]
+
+    @property
+    def shell_pos(self):
+        """
+        Position of each shell. Size: (n_shell, 3)
+        """
+        return self.xyz[self.shell_center]
+
+    def valence_s_funcs(self):
+        """
+        Returns the index of the first s function on each atom that has one
+        and the atoms they are on
+        """
+        s_funcs = np.flatnonzero(self.l == 0)
+        centers, first = np.unique(self.center[s_funcs], return_index=True)
+        return s_funcs[first], centers
@@ -140,6 +140,8 @@ class MinimalNoCore(Basis):
         number of atomic basis functions
     funcs : list
         list of basis functions
+    compact : CompactBasis
+        struct-of-arrays copy of funcs used by the integral engines
     """
 
 
@@ -151,6 +153,24 @@ class MinimalNoCore(Basis):
         self.funcs = []
         self.populate_basis_from_mol()
 
+    def update_geometry(self, mol):
+        """
+        Moves the basis functions onto the atoms of a molecule with the same
+        atoms in the same order, e.g. the next frame of a trajectory, keeping
+        the basis layout
+
+        Parameters
+        ----------
+        mol : Molecule
+            molecule with new coordinates
+        """
+        if list(mol.symb) != list(self.mol.symb):
+            raise ValueError('the atoms of the new geometry do not match the basis')
+        self.mol = mol
+        for func in self.funcs:
+            func.pos = mol.xyz[func.center]
+        self.compact.xyz = np.asarray(mol.xyz, dtype=float)
+
     def populate_basis_from_mol(self):
         for i in range(self.mol.n_atom):
             # hydrogen and helium only have s functions
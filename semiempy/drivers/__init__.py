@@ -0,0 +1 @@
+# Drivers
@@ -0,0 +1,516 @@
+"""
+Batch driver running a semiempirical method on many structure files in a
+process pool
+
+Usage (from the semiempy directory):
+    python -m drivers.batch structures/ extra.xyz -o results.csv --workers 8
+    python -m drivers.batch library.sdf --records -o results.jsonl --workers 8
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import importlib.util
+import json
+import os
+import time
+from utils.molecule import Molecule, read_sdf_records
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from methods.CNDO import CNDO
+from methods.observers import SilentObserver
+from integrals.store import IntegralStore
+
+available_methods = {
+    "CNDO": CNDO
+}
+# method options passed to the constructor instead of set as attributes
+init_keywords = ['integral_backend', 'parameters']
+structure_extensions = ['xyz', 'sdf', 'mol']
+result_formats = ['csv', 'jsonl', 'parquet']
+result_columns = ['file', 'method', 'n_atom', 'n_func', 'converged', 'iterations',
+                  'E_elec', 'E_nuc', 'E_total', 'E_HOMO', 'E_LUMO', 'E_orbitals',
+                  'time_setup', 'time_scf', 'time_total', 'error', 'stats']
+record_columns = ['record', 'comment'] + result_columns
+# parquet column types, the stats are written as json like in csv files
+column_types = {'file': 'string', 'method': 'string', 'n_atom': 'int', 'n_func': 'int',
+                'converged': 'bool', 'iterations': 'int', 'E_elec': 'float', 'E_nuc': 'float',
+                'E_total': 'float', 'E_HOMO': 'float', 'E_LUMO': 'float', 'E_orbitals': 'floats',
+                'time_setup': 'float', 'time_scf': 'float', 'time_total': 'float',
+                'error': 'string', 'stats': 'string', 'record': 'int', 'frame': 'int',
+                'comment': 'string'}
+# rows per parquet row group, the rows of one group are held in memory
+parquet_row_group = 1024
+
+
+def find_structures(paths, extensions=structure_extensions):
+    """
+    Expands a list of files and directories into a sorted list of structure
+    files. Directories are searched recursively for files with one of the
+    given extensions.
+
+    Parameters
+    ----------
+    paths : list
+        structure files and directories
+    extensions : list
+        file extensions to collect from directories
+
+    Returns
+    -------
+    fnames : list
+        structure file names
+    """
+    fnames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for f in sorted(files):
+                    if f.rsplit('.', 1)[-1] in extensions:
+                        fnames.append(os.path.join(root, f))
+        else:
+            fnames.append(path)
+    return fnames
+
+
+def empty_result(fname, method):
+    result = dict.fromkeys(result_columns)
+    result['file'] = fname
+    result['method'] = method
+    result['converged'] = False
+    return result
+
+
+def setup_method(mol, bas, method="CNDO", method_options=None):
+    """
+    Constructs a method and applies its options
+
+    Parameters
+    ----------
+    mol : Molecule
+        molecule
+    bas : Basis
+        basis on the molecule
+    method : string
+        name of the method in available_methods
+    method_options : dict, optional
+        constructor keywords (init_keywords) or attributes (e.g.
+        scf_accelerator, guess, iteration_max, observers) of the method.
+        The method runs silently unless observers are given.
+
+    Returns
+    -------
+    calc : Method
+        method ready to run
+    """
+    options = dict(method_options or {})
+    init_options = {key: options.pop(key) for key in init_keywords if key in options}
+    calc = available_methods[method](mol, bas, **init_options)
+    # workers stay off stdout unless other observers are given
+    calc.observers = [SilentObserver()]
+    for key, value in options.items():
+        if not hasattr(calc, key):
+            raise AttributeError('{} has no option \'{}\''.format(method, key))
+        setattr(calc, key, value)
+    return calc
+
+
+def fill_result(result, calc):
+    """
+    Copies the outcome of a finished method into a result row
+    """
+    n_occ = calc.mol.num_val_elec//2
+    result['n_atom'] = calc.mol.n_atom
+    result['n_func'] = calc.bas.n_func
+    result['converged'] = bool(calc.converged)
+    result['iterations'] = calc.iteration_num
+    result['E_elec'] = float(calc.E_elec)
+    result['E_nuc'] = float(calc.mol.E_nuc)
+    result['E_total'] = float(calc.E_total)
+    # the purification density solver computes no orbitals
+    if calc.E_orbitals is not None:
+        result['E_orbitals'] = [float(e) for e in calc.E_orbitals]
+        result['E_HOMO'] = float(calc.E_orbitals[n_occ-1]) if n_occ > 0 else None
+        result['E_LUMO'] = float(calc.E_orbitals[n_occ]) if n_occ < len(calc.E_orbitals) else None
+    result['stats'] = calc.stats.to_dict()
+
+
+def run_structure(fname, method="CNDO", num_gaussians=3, charge=None, multiplicity=1,
+                  method_options=None):
+    """
+    Runs a method on one structure file and returns a row of results.
+    Errors are recorded in the row instead of being raised.
+
+    Parameters
+    ----------
+    fname : string
+        structure file name
+    method : string
+        name of the method in available_methods
+    num_gaussians : int
+        number of gaussians per STO-NG basis function
+    charge : int, optional
+        charge of the molecule. Defaults to the formal charges of sdf
+        records and 0 for other files.
+    multiplicity : int
+        multiplicity of the molecule
+    method_options : dict, optional
+        see setup_method
+
+    Returns
+    -------
+    result : dict
+        row with the columns in result_columns
+    """
+    start_time = time.time()
+    try:
+        mol = Molecule(fname, charge=charge, multiplicity=multiplicity)
+    except Exception as e:
+        result = empty_result(fname, method)
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+        result['time_total'] = time.time() - start_time
+        return result
+    read_time = time.time() - start_time
+    result = run_molecule(mol, method, num_gaussians, method_options)
+    result['file'] = fname
+    if result['time_setup'] is not None:
+        result['time_setup'] += read_time
+    result['time_total'] = time.time() - start_time
+    return result
+
+
+def run_molecule(mol, method="CNDO", num_gaussians=3, method_options=None):
+    """
+    Runs a method on a molecule and returns a row of results. Errors are
+    recorded in the row instead of being raised.
+
+    Parameters
+    ----------
+    mol : Molecule
+        molecule
+    method : string
+        name of the method in available_methods
+    num_gaussians : int
+        number of gaussians per STO-NG basis function
+    method_options : dict, optional
+        see setup_method
+
+    Returns
+    -------
+    result : dict
+        row with the columns in result_columns, without the file name
+    """
+    result = empty_result(None, method)
+    start_time = time.time()
+    try:
+        bas = MinimalNoCore(mol, num_gaussians=num_gaussians)
+        calc = setup_method(mol, bas, method, method_options)
+        scf_time = time.time()
+        result['time_setup'] = scf_time - start_time
+        calc.run()
+        result['time_scf'] = time.time() - scf_time
+        fill_result(result, calc)
+    except Exception as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    result['time_total'] = time.time() - start_time
+    return result
+
+
+def run_batch(fnames, workers=None, output=None, fmt=None, **kwargs):
+    """
+    Runs a method on many structure files in a process pool. A structure
+    that fails is reported in its row and does not stop the batch.
+
+    Parameters
+    ----------
+    fnames : list
+        structure files and directories, see find_structures
+    workers : int, optional
+        number of worker processes. Defaults to the number of CPUs and
+        1 runs everything in this process.
+    output : string, optional
+        results file name, see write_results
+    fmt : string, optional
+        results file format, see write_results
+    kwargs :
+        passed to run_structure
+
+    Returns
+    -------
+    results : list
+        one row per structure in input order
+    """
+    if output is not None:
+        fmt = results_format(output, fmt)
+    fnames = find_structures(fnames)
+    results = [None] * len(fnames)
+    if workers == 1:
+        for i, fname in enumerate(fnames):
+            results[i] = run_structure(fname, **kwargs)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_structure, fname, **kwargs): i for i, fname in enumerate(fnames)}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    # the worker itself died, e.g. it ran out of memory
+                    results[i] = empty_result(fnames[i], kwargs.get("method", "CNDO"))
+                    results[i]['error'] = '{}: {}'.format(type(e).__name__, e)
+    if output is not None:
+        write_results(results, output, fmt)
+    return results
+
+
+def iter_records(fname, workers=None, window=None, method="CNDO", num_gaussians=3,
+                 charge=None, multiplicity=1, method_options=None):
+    """
+    Runs a method on every record of a multi-record sdf file in a process
+    pool. Records are read lazily and at most window of them are in flight,
+    so libraries of millions of records run in constant memory. A record
+    that fails is reported in its row and does not stop the run.
+
+    Parameters
+    ----------
+    fname : string
+        sdf file name
+    workers : int, optional
+        number of worker processes. Defaults to the number of CPUs and
+        1 runs everything in this process.
+    window : int, optional
+        number of records in flight at once. Defaults to 4 per worker.
+    method, num_gaussians, method_options :
+        see run_molecule
+    charge : int, optional
+        charge of each molecule. Defaults to the formal charges of each
+        record.
+    multiplicity : int
+        multiplicity of each molecule
+
+    Yields
+    ------
+    result : dict
+        row with the columns in record_columns for each record, in file
+        order
+    """
+    def record_result(i, name, result):
+        result['file'] = fname
+        result['record'] = i
+        result['comment'] = name
+        return result
+
+    def collect(i, name, future, error):
+        if future is not None:
+            try:
+                return record_result(i, name, future.result())
+            except Exception as e:
+                # the worker itself died, e.g. it ran out of memory
+                error = '{}: {}'.format(type(e).__name__, e)
+        result = empty_result(None, method)
+        result['error'] = error
+        return record_result(i, name, result)
+
+    records = read_sdf_records(fname, charge, multiplicity)
+    if workers == 1:
+        for i, (name, mol, error) in enumerate(records):
+            if mol is None:
+                yield collect(i, name, None, error)
+            else:
+                yield record_result(i, name, run_molecule(mol, method, num_gaussians, method_options))
+        return
+    if window is None:
+        window = 4*(workers or os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for i, (name, mol, error) in enumerate(records):
+            future = None if mol is None else pool.submit(run_molecule, mol, method, num_gaussians, method_options)
+            pending.append((i, name, future, error))
+            if len(pending) >= window:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+
+
+def run_records(fnames, output, fmt=None, **kwargs):
+    """
+    Streams the records of multi-record sdf files through iter_records and
+    writes each row as soon as it is collected
+
+    Parameters
+    ----------
+    fnames : list
+        sdf file names
+    output : string
+        results file name, see write_results
+    fmt : string, optional
+        results file format, see write_results
+    kwargs :
+        passed to iter_records
+
+    Returns
+    -------
+    counts : dict
+        number of records, converged records and failed records
+    """
+    fmt = results_format(output, fmt)
+    counts = {'records': 0, 'converged': 0, 'failed': 0}
+
+    def rows():
+        for fname in fnames:
+            for result in iter_records(fname, **kwargs):
+                counts['records'] += 1
+                counts['converged'] += int(result['converged'])
+                counts['failed'] += int(result['error'] is not None)
+                yield result
+    write_results(rows(), output, fmt, columns=record_columns)
+    return counts
+
+
+def results_format(fname, fmt=None):
+    """
+    Returns the format of a results file and checks that it can be
+    written, so a run fails before any structure is computed
+
+    Parameters
+    ----------
+    fname : string
+        output file name
+    fmt : string, optional
+        'csv', 'jsonl' or 'parquet'. Defaults to the file extension.
+
+    Returns
+    -------
+    fmt : string
+        results file format
+    """
+    if fmt is None:
+        fmt = fname.rsplit('.', 1)[-1]
+    if fmt not in result_formats:
+        raise NotImplementedError(
+            'results format \'{}\' is unsupported. Accepted formats: {}'.format(
+                fmt, str(result_formats).strip('[]')))
+    if fmt == 'parquet':
+        # found without importing, pyarrow is only imported to write the file
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError('parquet results require pyarrow, use a .csv or .jsonl output instead')
+    return fmt
+
+
+def write_results(results, fname, fmt=None, columns=result_columns):
+    """
+    Writes result rows to a columnar file
+
+    Parameters
+    ----------
+    results : iterable
+        rows returned by run_structure. Rows are written as they are
+        iterated, parquet rows in row groups of parquet_row_group rows.
+    fname : string
+        output file name
+    fmt : string, optional
+        'csv', 'jsonl' or 'parquet'. Defaults to the file extension.
+        Parquet requires pyarrow.
+    columns : list
+        column names in output order
+    """
+    fmt = results_format(fname, fmt)
+    if fmt == 'csv':
+        with open(fname, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for row in results:
+                row = dict(row)
+                if row['E_orbitals'] is not None:
+                    row['E_orbitals'] = ' '.join(repr(e) for e in row['E_orbitals'])
+                if row['stats'] is not None:
+                    row['stats'] = json.dumps(row['stats'])
+                writer.writerow(row)
+    elif fmt == 'jsonl':
+        with open(fname, 'w') as f:
+            for row in results:
+                f.write(json.dumps({key: row[key] for key in columns}) + '\n')
+    elif fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(),
+                 'bool': pa.bool_(), 'floats': pa.list_(pa.float64())}
+        schema = pa.schema([(key, types[column_types[key]]) for key in columns])
+        with pq.ParquetWriter(fname, schema) as writer:
+            group = []
+            for row in results:
+                row = {key: row[key] for key in columns}
+                if row['stats'] is not None:
+                    row['stats'] = json.dumps(row['stats'])
+                group.append(row)
+                if len(group) == parquet_row_group:
+                    writer.write_table(pa.Table.from_pylist(group, schema=schema))
+                    group = []
+            if group:
+                writer.write_table(pa.Table.from_pylist(group, schema=schema))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a semiempirical method on many structures.')
+    parser.add_argument('paths', nargs='+', help='structure files or directories')
+    parser.add_argument('-o', '--output', default='results.csv', help='results file (.csv, .jsonl or .parquet)')
+    parser.add_argument('--format', default=None, choices=result_formats, help='results format')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--records', action='store_true',
+                        help='run every record of multi-record sdf files, streaming the results')
+    parser.add_argument('--method', default='CNDO', choices=sorted(available_methods))
+    parser.add_argument('--num-gaussians', type=int, default=3)
+    parser.add_argument('--charge', type=int, default=None,
+                        help='molecular charge, by default 0 or the formal charges of sdf records')
+    parser.add_argument('--multiplicity', type=int, default=1)
+    parser.add_argument('--integral-backend', default=None)
+    parser.add_argument('--accelerator', default=None, help='SCF accelerator: diis, ediis or none')
+    parser.add_argument('--guess', default=None, help='initial guess: zero, sad or huckel')
+    parser.add_argument('--iteration-max', type=int, default=None)
+    parser.add_argument('--density-solver', default=None, help='eigh, occupied or purification')
+    parser.add_argument('--parameters', default=None, help='parameter set name or json file')
+    parser.add_argument('--integral-store', default=None,
+                        help='directory keeping integrals between runs on the same structures')
+    parser.add_argument('--integral-cache', action='store_true',
+                        help='share integrals between the structures run by each worker')
+    args = parser.parse_args(argv)
+    try:
+        results_format(args.output, args.format)
+    except (NotImplementedError, ImportError) as e:
+        parser.error(str(e))
+
+    method_options = {}
+    if args.integral_backend is not None:
+        method_options['integral_backend'] = args.integral_backend
+    if args.accelerator is not None:
+        method_options['scf_accelerator'] = None if args.accelerator.lower() == 'none' else args.accelerator
+    if args.guess is not None:
+        method_options['guess'] = args.guess
+    if args.iteration_max is not None:
+        method_options['iteration_max'] = args.iteration_max
+    if args.density_solver is not None:
+        method_options['density_solver'] = args.density_solver
+    if args.parameters is not None:
+        method_options['parameters'] = args.parameters
+    if args.integral_store is not None:
+        method_options['integral_store'] = IntegralStore(args.integral_store)
+    if args.integral_cache:
+        method_options['integral_cache'] = True
+    if args.records:
+        counts = run_records(find_structures(args.paths, ['sdf']), args.output, fmt=args.format,
+                             workers=args.workers, method=args.method, num_gaussians=args.num_gaussians,
+                             charge=args.charge, multiplicity=args.multiplicity, method_options=method_options)
+        print('{} records: {} converged, {} failed. Results written to {}'.format(
+            counts['records'], counts['converged'], counts['failed'], args.output))
+        return
+    results = run_batch(args.paths, workers=args.workers, output=args.output, fmt=args.format,
+                        method=args.method, num_gaussians=args.num_gaussians, charge=args.charge,
+                        multiplicity=args.multiplicity, method_options=method_options)
+    n_converged = sum(1 for row in results if row['converged'])
+    n_failed = sum(1 for row in results if row['error'] is not None)
+    print('{} structures: {} converged, {} failed. Results written to {}'.format(
+        len(results), n_converged, n_failed, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Trajectory driver running a semiempirical method on every frame of a
+multi-frame structure file, reusing the basis layout and parameters and
+warm starting each SCF from the density of the previous frame. Besides xyz
+files, every geometry of a cclib parsable output (optimizations, scans) can
+be rescored. Rows are written as each frame finishes.
+
+Usage (from the semiempy directory):
+    python -m drivers.trajectory md.xyz -o frames.csv
+    python -m drivers.trajectory scan.log -o scan.csv
+"""
+import argparse
+import time
+from utils.molecule import iter_xyz_frames, iter_cclib_frames
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from drivers.batch import available_methods, result_columns, result_formats, empty_result
+from drivers.batch import setup_method, fill_result, write_results, results_format
+
+frame_columns = ['frame', 'comment'] + result_columns
+
+
+def run_frames(frames, method="CNDO", num_gaussians=3, method_options=None, warm_start=True):
+    """
+    Runs a method on a sequence of geometries of the same molecule. The
+    basis and method objects built for the first frame are moved onto each
+    following frame and, with warm_start, each SCF starts from the
+    converged density of the frame before. A frame that fails is reported
+    in its row and the next frame starts cold.
+
+    Parameters
+    ----------
+    frames : iterable
+        Molecule of each frame, e.g. from utils.molecule.iter_xyz_frames or
+        utils.molecule.iter_cclib_frames
+    method : string
+        name of the method in drivers.batch.available_methods
+    num_gaussians : int
+        number of gaussians per STO-NG basis function
+    method_options : dict, optional
+        see drivers.batch.setup_method
+    warm_start : bool
+        start each SCF from the density of the previous frame
+
+    Yields
+    ------
+    result : dict
+        row with the columns in frame_columns for each frame
+    """
+    calc = None
+    D_guess = None
+    for i, mol in enumerate(frames):
+        result = empty_result(None, method)
+        result['frame'] = i
+        result['comment'] = getattr(mol, 'comment', None)
+        start_time = time.time()
+        try:
+            if calc is None or list(mol.symb) != list(calc.mol.symb):
+                bas = MinimalNoCore(mol, num_gaussians=num_gaussians)
+                calc = setup_method(mol, bas, method, method_options)
+                D_guess = None
+            else:
+                calc.set_molecule(mol)
+            scf_time = time.time()
+            result['time_setup'] = scf_time - start_time
+            calc.run(D_guess if warm_start else None)
+            result['time_scf'] = time.time() - scf_time
+            fill_result(result, calc)
+            D_guess = calc.D.copy() if calc.converged else None
+        except Exception as e:
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+            calc = None
+        result['time_total'] = time.time() - start_time
+        yield result
+
+
+def run_trajectory(fname, output, fmt=None, charge=0, multiplicity=1, **kwargs):
+    """
+    Streams the frames of a multi-frame xyz file, or the geometries of a
+    cclib parsable output, through run_frames and writes each row as soon
+    as its frame is done, so neither the frames nor the rows are held in
+    memory
+
+    Parameters
+    ----------
+    fname : string
+        xyz file name or cclib parsable output file name
+    output : string
+        results file name, see drivers.batch.write_results
+    fmt : string, optional
+        results file format, see drivers.batch.write_results
+    charge, multiplicity : int
+        charge and multiplicity of the molecule
+    kwargs :
+        passed to run_frames
+
+    Returns
+    -------
+    counts : dict
+        number of frames, converged frames and failed frames
+    """
+    fmt = results_format(output, fmt)
+    if fname.rsplit('.', 1)[-1] == 'xyz':
+        frames = iter_xyz_frames(fname, charge, multiplicity)
+    else:
+        frames = iter_cclib_frames(fname, charge, multiplicity)
+    counts = {'frames': 0, 'converged': 0, 'failed': 0}
+
+    def rows():
+        for result in run_frames(frames, **kwargs):
+            result['file'] = fname
+            counts['frames'] += 1
+            counts['converged'] += int(result['converged'])
+            counts['failed'] += int(result['error'] is not None)
+            yield result
+    write_results(rows(), output, fmt, columns=frame_columns)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a semiempirical method on every frame of a trajectory.')
+    parser.add_argument('trajectory', help='multi-frame xyz file or cclib parsable output')
+    parser.add_argument('-o', '--output', default='frames.csv', help='results file (.csv, .jsonl or .parquet)')
+    parser.add_argument('--format', default=None, choices=result_formats, help='results format')
+    parser.add_argument('--method', default='CNDO', choices=sorted(available_methods))
+    parser.add_argument('--num-gaussians', type=int, default=3)
+    parser.add_argument('--charge', type=int, default=0)
+    parser.add_argument('--multiplicity', type=int, default=1)
+    parser.add_argument('--cold', action='store_true', help='do not warm start from the previous frame')
+    args = parser.parse_args(argv)
+    try:
+        results_format(args.output, args.format)
+    except (NotImplementedError, ImportError) as e:
+        parser.error(str(e))
+    counts = run_trajectory(args.trajectory, args.output, fmt=args.format,
+                            charge=args.charge, multiplicity=args.multiplicity,
+                            method=args.method, num_gaussians=args.num_gaussians,
+                            warm_start=not args.cold)
+    print('{} frames: {} converged, {} failed. Results written to {}'.format(
+        counts['frames'], counts['converged'], counts['failed'], args.output))
+
+
+if __name__ == '__main__':
+    main()
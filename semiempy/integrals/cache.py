@@ -0,0 +1,150 @@
+"""
+Translation invariant memoization of integral blocks shared by every
+calculation in a process
+"""
+import collections
+import numpy as np
+
+
+class IntegralCache:
+    """
+    Least recently used cache of integral blocks keyed on the kind of
+    integral, the types of the two shells and their displacement rounded to
+    a resolution. Identical bonds in different molecules, or atoms that did
+    not move between trajectory frames, then share their integrals.
+
+    Attributes
+    ----------
+    max_bytes : int
+        approximate memory bound. The least recently used blocks are
+        dropped once it is exceeded.
+    resolution : float
+        displacements in angstrom are rounded to multiples of resolution
+        when forming keys
+    hits, misses, evictions : int
+        lookup and eviction counters
+    n_bytes : int
+        approximate memory held by the cached blocks
+    """
+    # rough per entry cost of the key tuple and dictionary slot in bytes
+    entry_overhead = 200
+
+    def __init__(self, max_bytes=2**28, resolution=1e-8):
+        self.max_bytes = max_bytes
+        self.resolution = resolution
+        self.shell_type_ids = {}
+        self.clear()
+
+    def clear(self):
+        """
+        Drops every cached block and resets the counters
+        """
+        self.entries = collections.OrderedDict()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def shell_types(self, descriptors):
+        """
+        Returns a small integer id for each shell descriptor, the same id for
+        equal descriptors across calls
+
+        Parameters
+        ----------
+        descriptors : iterable
+            hashable description of each shell, e.g. the atomic number,
+            angular momentum, exponents and coefficients
+
+        Returns
+        -------
+        ids : np.ndarray
+            shell type id of each descriptor
+        """
+        ids = [self.shell_type_ids.setdefault(d, len(self.shell_type_ids)) for d in descriptors]
+        return np.array(ids, dtype=np.int64)
+
+    def keys(self, kind, type_a, type_b, displacement):
+        """
+        Returns the cache key of each shell pair
+
+        Parameters
+        ----------
+        kind : string
+            name of the integral, e.g. 'overlap'
+        type_a, type_b : np.ndarray
+            shell type ids from shell_types. Size: (n_pair,)
+        displacement : np.ndarray
+            displacement between the shells in angstrom, either vectors or
+            distances for rotation invariant integrals. Size: (n_pair, 3)
+            or (n_pair,)
+
+        Returns
+        -------
+        keys : list
+            hashable key of each pair
+        """
+        d = np.rint(np.asarray(displacement)/self.resolution).astype(np.int64)
+        columns = [type_a.tolist(), type_b.tolist()]
+        if d.ndim == 1:
+            columns.append(d.tolist())
+        else:
+            columns.extend(d.T.tolist())
+        return [(kind,) + key for key in zip(*columns)]
+
+    def lookup(self, keys):
+        """
+        Returns the cached block of each key and the positions of the keys
+        that were not cached
+
+        Returns
+        -------
+        values : list
+            cached block of each key or None
+        missing : np.ndarray
+            indices of the keys without a cached block
+        """
+        entries = self.entries
+        values = [entries.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        for i, key in enumerate(keys):
+            if values[i] is not None:
+                entries.move_to_end(key)
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return values, np.array(missing, dtype=np.int64)
+
+    def store(self, keys, blocks):
+        """
+        Adds blocks to the cache, evicting the least recently used ones
+        beyond max_bytes
+        """
+        entries = self.entries
+        for key, block in zip(keys, blocks):
+            if key in entries:
+                continue
+            block = np.array(block)
+            entries[key] = block
+            self.n_bytes += block.nbytes + self.entry_overhead
+        while self.n_bytes > self.max_bytes and entries:
+            key, block = entries.popitem(last=False)
+            self.n_bytes -= block.nbytes + self.entry_overhead
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns the cache counters as a dictionary
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'n_bytes': self.n_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits/lookups if lookups else 0.0
+        }
+
+
+# cache shared by every calculation in this process that asks for it
+default_cache = IntegralCache()
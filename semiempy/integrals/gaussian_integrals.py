@@ -1,3 +1,4 @@
+import numpy as np
 import pyscf
 from pyscf import gto
 
@@ -27,10 +28,88 @@ def overlap(GaussianA, GaussianB):
     mol.build()
     num_funcs_on_A = ang_num_funcs[GaussianA.angular_momentum[0]+GaussianA.angular_momentum[1]+GaussianA.angular_momentum[2]]
     num_funcs_on_B = ang_num_funcs[GaussianB.angular_momentum[0]+GaussianB.angular_momentum[1]+GaussianB.angular_momentum[2]]
-    idxA = num_funcs_on_A - 1
-    idxB = num_funcs_on_A + num_funcs_on_B - 1
+    # cartesian p components are ordered x, y, z within a shell
+    idxA = GaussianA.angular_momentum[1] + 2*GaussianA.angular_momentum[2]
+    idxB = num_funcs_on_A + GaussianB.angular_momentum[1] + 2*GaussianB.angular_momentum[2]
     return mol.intor('cint1e_ovlp_cart')[idxA][idxB]
 
+
+def _funcs_to_mole(funcs):
+    """
+    Translates a list of basis functions into a single pyscf molecule with
+    one ghost atom per center. Functions on the same center that share
+    exponents and contraction coefficients (e.g. px, py, pz) are grouped
+    into one shell.
+
+    Parameters
+    ----------
+    funcs : list
+        list of gaussian basis functions
+
+    Returns
+    -------
+    mol : pyscf.gto.Mole
+        built pyscf molecule
+    ao_idx : list
+        index of the pyscf atomic orbital corresponding to each function
+    """
+    ang_num_funcs = [1, 3]
+    # shells[center] is a list of [l, exps, coeffs, funcs] in order of appearance
+    shells = {}
+    pos = {}
+    for i, func in enumerate(funcs):
+        l = func.angular_momentum[0] + func.angular_momentum[1] + func.angular_momentum[2]
+        key = (l, tuple(func.exponents), tuple(func.contract_coeff))
+        center_shells = shells.setdefault(func.center, [])
+        pos[func.center] = func.pos
+        for shell in center_shells:
+            if shell[0] == key and len(shell[1]) < ang_num_funcs[l]:
+                shell[1].append(i)
+                break
+        else:
+            center_shells.append([key, [i]])
+
+    mol = gto.Mole()
+    atoms = []
+    basis = {}
+    ao_idx = [0] * len(funcs)
+    offset = 0
+    for center in sorted(shells):
+        label = "ghost{}".format(center)
+        atoms.append("{} {} {} {}".format(label, pos[center][0], pos[center][1], pos[center][2]))
+        basis[label] = []
+        for (l, exps, coeffs), members in shells[center]:
+            basis[label].append([l] + [[exps[k], coeffs[k]] for k in range(len(exps))])
+            for i in members:
+                ang = funcs[i].angular_momentum
+                # cartesian p components are ordered x, y, z
+                ao_idx[i] = offset + (ang[1] + 2*ang[2] if l == 1 else 0)
+            offset += ang_num_funcs[l]
+    mol.atom = "\n".join(atoms)
+    mol.basis = basis
+    mol.build()
+    return mol, ao_idx
+
+
+def overlap_matrix(bas):
+    """
+    Returns the overlap matrix between all functions in a basis using a
+    single integral call
+
+    Parameters
+    ----------
+    bas : Basis
+        basis with a list of gaussian functions in bas.funcs
+
+    Returns
+    -------
+    S : np.ndarray
+        overlap matrix. Size: (n_func, n_func)
+    """
+    mol, ao_idx = _funcs_to_mole(bas.funcs)
+    S = mol.intor('cint1e_ovlp_cart')
+    return S[np.ix_(ao_idx, ao_idx)]
+
 __idx2_cache = {}
 def idx2(i, j):
     if (i, j) in __idx2_cache:
@@ -89,3 +168,56 @@ def twoelec(GaussianA, GaussianB, GaussianC, GaussianD):
     idxC = num_funcs_on_A + num_funcs_on_B + num_funcs_on_C - 1
     idxD = num_funcs_on_A + num_funcs_on_B + num_funcs_on_C + num_funcs_on_D - 1
     return mol.intor('cint2e_sph', aosym='s8')[idx4(idxA,idxB,idxC,idxD)]
+
+
+def gamma_matrix(bas):
+    """
+    Returns the two-center Coulomb integrals gamma_AB = (s_A s_A|s_B s_B)
+    between the valence s functions of every pair of atoms. The product
+    s_A s_A is a sum of s gaussians with exponents a_i + a_j and weights
+    c_i c_j, so gamma is the Coulomb matrix of one s shell per atom,
+    computed with a single two-center integral call.
+
+    Parameters
+    ----------
+    bas : Basis
+        basis with a list of gaussian functions in bas.funcs
+
+    Returns
+    -------
+    gamma : np.ndarray
+        atom pair Coulomb matrix. Size: (n_atom, n_atom)
+    """
+    # the first s function on each center is the valence s function
+    s_funcs = {}
+    for func in bas.funcs:
+        if sum(func.angular_momentum) == 0 and func.center not in s_funcs:
+            s_funcs[func.center] = func
+    centers = sorted(s_funcs)
+    mol = gto.Mole()
+    atoms = []
+    basis = {}
+    norms = np.zeros(len(centers))
+    for k, center in enumerate(centers):
+        func = s_funcs[center]
+        exps = np.asarray(func.exponents, dtype=float)
+        # contraction coefficients refer to normalized primitives
+        coeffs = np.asarray(func.contract_coeff, dtype=float) * (2.0*exps/np.pi)**0.75
+        i, j = np.triu_indices(len(exps))
+        dens_exps = exps[i] + exps[j]
+        dens_coeffs = np.where(i == j, 1.0, 2.0) * coeffs[i] * coeffs[j]
+        # scale the density to one electron
+        dens_coeffs /= np.sum(dens_coeffs * (np.pi/dens_exps)**1.5)
+        # pyscf normalizes the shell to chi = rho/sqrt(<rho|rho>), undone below
+        p = dens_exps[:, None] + dens_exps[None, :]
+        norms[k] = np.sqrt(np.sum(dens_coeffs[:, None]*dens_coeffs[None, :] * (np.pi/p)**1.5))
+        label = "ghost{}".format(center)
+        atoms.append("{} {} {} {}".format(label, func.pos[0], func.pos[1], func.pos[2]))
+        # pyscf coefficients refer to normalized primitives
+        basis[label] = [[0] + [[e, c] for e, c in zip(dens_exps, dens_coeffs*(np.pi/(2.0*dens_exps))**0.75)]]
+    mol.atom = "\n".join(atoms)
+    mol.basis = basis
+    mol.build()
+    gamma = np.zeros((bas.mol.n_atom, bas.mol.n_atom))
+    gamma[np.ix_(centers, centers)] = mol.intor('int2c2e_sph') * norms[:, None] * norms[None, :]
+    return gamma
@@ -0,0 +1,381 @@
+"""
+Analytic integrals over contracted s and p cartesian gaussians evaluated
+with numpy broadcasting over all function pairs at once
+"""
+import numpy as np
+import scipy.sparse as sparse
+import scipy.special as sps
+from utils.molecule_utils import bohr, neighbor_list
+
+# maximum number of broadcast elements held in memory by one block
+block_elements = 2**16
+
+
+def _normalized_coeffs(exps, coeffs, l):
+    """
+    Multiplies contraction coefficients by the primitive normalization and
+    rescales them so each contracted function is normalized
+
+    Parameters
+    ----------
+    exps : np.ndarray
+        primitive exponents. Size: (n_func, n_prim)
+    coeffs : np.ndarray
+        contraction coefficients. Size: (n_func, n_prim)
+    l : np.ndarray
+        total angular momentum. Size: (n_func,)
+
+    Returns
+    -------
+    coeffs : np.ndarray
+        normalized contraction coefficients. Size: (n_func, n_prim)
+    """
+    l = l[:, None].astype(float)
+    # primitive normalization (2a/pi)^(3/4) (4a)^(l/2)
+    coeffs = coeffs * (2.0*exps/np.pi)**0.75 * (4.0*exps)**(0.5*l)
+    # normalize the contraction with the one-center overlap
+    p = exps[:, :, None] + exps[:, None, :]
+    self_ovlp = (np.pi/p)**1.5 * (0.5/p)**l[:, :, None]
+    norm = np.einsum('ij,ik,ijk->i', coeffs, coeffs, self_ovlp)
+    return coeffs / np.sqrt(norm)[:, None]
+
+
+def _overlap_primitive_sums(a, b, coeffs_a, coeffs_b, AB):
+    """
+    Returns the primitive sums needed to build every cartesian s/p overlap
+    between two shells
+
+    With P the gaussian product center, (P-A) = -b/p AB and (P-B) = a/p AB,
+    so for normalized primitive products W = c_a c_b (pi/p)^(3/2) exp(-ab/p AB^2)
+
+        (s|s)   = sum W
+        (p_k|s) = -AB_k sum W b/p
+        (s|p_k) = AB_k sum W a/p
+        (p_k|p_m) = -AB_k AB_m sum W ab/p^2 + delta_km sum W/(2p)
+
+    Parameters
+    ----------
+    a, b, coeffs_a, coeffs_b : np.ndarray
+        exponents and normalized coefficients broadcastable to the primitive
+        pair shape (..., n_prim_a, n_prim_b)
+    AB : np.ndarray
+        displacement between shell centers. Size: (..., 3)
+
+    Returns
+    -------
+    sums : list
+        the five primitive sums above. Size of each: (...)
+    """
+    inv_p = 1.0/(a + b)
+    b_p = b*inv_p
+    a_p = a*inv_p
+    r2 = np.sum(AB**2, axis=-1)[..., None, None]
+    W = np.exp(-(a*b_p)*r2)
+    W *= np.pi**1.5*inv_p*np.sqrt(inv_p)
+    W *= coeffs_a
+    W *= coeffs_b
+    W_b = W*b_p
+    return [
+        W.sum(axis=(-2, -1)),
+        W_b.sum(axis=(-2, -1)),
+        (W*a_p).sum(axis=(-2, -1)),
+        (W_b*a_p).sum(axis=(-2, -1)),
+        (W*inv_p).sum(axis=(-2, -1))*0.5
+    ]
+
+
+def _overlap_shell_block(exps_a, coeffs_a, pos_a, exps_b, coeffs_b, pos_b):
+    """
+    Returns the displacements and primitive sums between each shell of set a
+    and each shell of set b. Size: (n_a, n_b, 3) and (n_a, n_b)
+    """
+    AB = pos_a[:, None, :] - pos_b[None, :, :]
+    sums = _overlap_primitive_sums(exps_a[:, None, :, None], exps_b[None, :, None, :],
+                                   coeffs_a[:, None, :, None], coeffs_b[None, :, None, :], AB)
+    return AB, sums
+
+
+def _overlap_pair_blocks(exps, coeffs, pos, shell_l, sa, sb):
+    """
+    Returns the cartesian overlap block of each shell pair, zero padded to
+    3x3 for s shells. Size: (n_pair, 3, 3)
+    """
+    AB = pos[sa] - pos[sb]
+    W, W_b, W_a, W_ab, W_h = _overlap_primitive_sums(
+        exps[sa][:, :, None], exps[sb][:, None, :],
+        coeffs[sa][:, :, None], coeffs[sb][:, None, :], AB)
+    la = shell_l[sa]
+    lb = shell_l[sb]
+    block = np.zeros((len(sa), 3, 3))
+    ss = (la == 0) & (lb == 0)
+    sp = (la == 0) & (lb == 1)
+    ps = (la == 1) & (lb == 0)
+    pp = (la == 1) & (lb == 1)
+    block[ss, 0, 0] = W[ss]
+    block[sp, 0, :] = AB[sp]*W_a[sp, None]
+    block[ps, :, 0] = -AB[ps]*W_b[ps, None]
+    block[pp] = (-AB[pp, :, None]*AB[pp, None, :]*W_ab[pp, None, None]
+                 + np.eye(3)*W_h[pp, None, None])
+    return block
+
+
+def _scatter_pair_blocks(shell_funcs, sa, sb, block):
+    """
+    Returns the entries of shell pair blocks that belong to functions as
+    (row, column, value) entries
+    """
+    rows = np.broadcast_to(shell_funcs[sa][:, :, None], block.shape)
+    cols = np.broadcast_to(shell_funcs[sb][:, None, :], block.shape)
+    mask = (rows >= 0) & (cols >= 0)
+    return rows[mask], cols[mask], block[mask]
+
+
+def _shell_descriptors(cb, shells):
+    """
+    Returns a hashable description of each shell that identifies its
+    integrals up to the shell position
+    """
+    return [(int(Z), int(l), exps.tobytes(), coeffs.tobytes()) for Z, l, exps, coeffs in
+            zip(cb.shell_Z[shells], cb.shell_l[shells], cb.shell_exps[shells], cb.shell_coeffs[shells])]
+
+
+def _cached_blocks(cache, kind, type_a, type_b, displacement, compute):
+    """
+    Returns the integral blocks of a list of shell pairs. Blocks missing
+    from the cache are evaluated with compute(indices) and stored.
+    """
+    keys = cache.keys(kind, type_a, type_b, displacement)
+    values, missing = cache.lookup(keys)
+    if len(missing):
+        computed = compute(missing)
+        cache.store([keys[i] for i in missing], computed)
+        for i, value in zip(missing, computed):
+            values[i] = value
+    return np.array(values)
+
+
+def _shell_funcs(cb):
+    """
+    Returns the function index of each cartesian component of each shell,
+    padded with -1 for the missing components of s shells. Size: (n_shell, 3)
+    """
+    shell_funcs = np.full((cb.n_shell, 3), -1, dtype=np.int64)
+    shell_funcs[cb.func_shell, cb.func_component] = np.arange(cb.n_func)
+    return shell_funcs
+
+
+def overlap_matrix(bas, cutoff=None, cache=None):
+    """
+    Returns the overlap matrix between all functions in a basis. Integrals
+    are evaluated once per shell pair and whole s/p blocks are scattered
+    into the matrix.
+
+    Parameters
+    ----------
+    bas : Basis
+        basis with a compact struct-of-arrays copy in bas.compact
+    cutoff : float, optional
+        distance in angstrom beyond which shell pairs are skipped. With a
+        cutoff only the pairs from a neighbor list are evaluated and S is
+        returned as a sparse matrix.
+    cache : integrals.cache.IntegralCache, optional
+        cache of shell pair blocks shared with other calculations
+
+    Returns
+    -------
+    S : np.ndarray or scipy.sparse.csr_matrix
+        overlap matrix. Size: (n_func, n_func)
+    """
+    cb = bas.compact
+    exps = cb.shell_exps
+    coeffs = _normalized_coeffs(cb.shell_exps, cb.shell_coeffs, cb.shell_l)
+    pos = cb.shell_pos/bohr
+    shell_funcs = _shell_funcs(cb)
+    if cutoff is not None or cache is not None:
+        if cutoff is None:
+            sa, sb = np.triu_indices(cb.n_shell, k=1)
+        else:
+            sa, sb = neighbor_list(cb.shell_pos, cutoff)
+        S = _pair_overlap_matrix(cb, exps, coeffs, pos, shell_funcs, sa, sb, cache)
+        return S.toarray() if cutoff is None else S.tocsr()
+    s_shells = np.flatnonzero(cb.shell_l == 0)
+    p_shells = np.flatnonzero(cb.shell_l == 1)
+    # function indices of each shell, shaped for scattering blocks
+    funcs_s = shell_funcs[s_shells, :1]
+    funcs_p = shell_funcs[p_shells]
+    S = np.zeros((cb.n_func, cb.n_func))
+    n_prim = exps.shape[1]
+    step = max(1, block_elements // (cb.n_shell*n_prim**2))
+    for rows, row_funcs in ((s_shells, funcs_s), (p_shells, funcs_p)):
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            AB, (W, W_b, W_a, W_ab, W_h) = _overlap_shell_block(
+                exps[block], coeffs[block], pos[block], exps, coeffs, pos)
+            # split the columns into s and p shells
+            AB_s, AB_p = AB[:, s_shells], AB[:, p_shells]
+            fa = row_funcs[start:start + step][:, None, :, None]
+            if rows is s_shells:
+                S[fa, funcs_s[None, :, None, :]] = W[:, s_shells, None, None]
+                S[fa, funcs_p[None, :, None, :]] = (AB_p*W_a[:, p_shells, None])[:, :, None, :]
+            else:
+                S[fa, funcs_s[None, :, None, :]] = (-AB_s*W_b[:, s_shells, None])[:, :, :, None]
+                S[fa, funcs_p[None, :, None, :]] = (
+                    -AB_p[:, :, :, None]*AB_p[:, :, None, :]*W_ab[:, p_shells, None, None]
+                    + np.eye(3)*W_h[:, p_shells, None, None])
+    return S
+
+
+def _pair_overlap_matrix(cb, exps, coeffs, pos, shell_funcs, sa, sb, cache=None):
+    """
+    Returns the overlap matrix over each shell with itself and the listed
+    shell pairs a < b, mirrored, as a sparse matrix
+    """
+    self_shells = np.arange(cb.n_shell)
+    if cache is not None:
+        types = cache.shell_types(_shell_descriptors(cb, self_shells))
+        # the lower shell type first so mirrored pairs share a key
+        swap = types[sa] > types[sb]
+        sa, sb = np.where(swap, sb, sa), np.where(swap, sa, sb)
+    rows, cols, vals = [], [], []
+    step = max(1, block_elements // exps.shape[1]**2)
+
+    def compute(pair_a, pair_b):
+        blocks = [_overlap_pair_blocks(exps, coeffs, pos, cb.shell_l,
+                                       pair_a[start:start + step], pair_b[start:start + step])
+                  for start in range(0, len(pair_a), step)]
+        return np.concatenate(blocks) if blocks else np.zeros((0, 3, 3))
+
+    for pair_a, pair_b, mirror in ((self_shells, self_shells, False), (sa, sb, True)):
+        if cache is None:
+            blocks = compute(pair_a, pair_b)
+        else:
+            blocks = _cached_blocks(cache, 'overlap', types[pair_a], types[pair_b],
+                                    cb.shell_pos[pair_a] - cb.shell_pos[pair_b],
+                                    lambda i: compute(pair_a[i], pair_b[i]))
+        if len(pair_a) == 0:
+            continue
+        r, c, v = _scatter_pair_blocks(shell_funcs, pair_a, pair_b, blocks)
+        rows.append(r)
+        cols.append(c)
+        vals.append(v)
+        if mirror:
+            rows.append(c)
+            cols.append(r)
+            vals.append(v)
+    return sparse.coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(cb.n_func, cb.n_func))
+
+
+def boys0(t):
+    """
+    Zeroth order Boys function F0(t) = int_0^1 exp(-t u^2) du
+    """
+    t = np.asarray(t, dtype=float)
+    small = t < 1e-12
+    safe_t = np.where(small, 1.0, t)
+    return np.where(small, 1.0 - t/3.0,
+                    0.5*np.sqrt(np.pi/safe_t)*sps.erf(np.sqrt(safe_t)))
+
+
+def _gamma_primitive_sum(p, q, dens_coeffs_a, dens_coeffs_b, r2):
+    """
+    Returns the Coulomb interaction between two s densities from their
+    exponents and weights broadcastable to (..., n_dens_a, n_dens_b)
+
+        (a|b) = sum w_a w_b 2 pi^(5/2) / (p q sqrt(p + q)) F0(pq/(p + q) R^2)
+    """
+    eri = 2.0*np.pi**2.5/(p*q*np.sqrt(p + q)) * boys0(p*q/(p + q)*r2[..., None, None])
+    eri *= dens_coeffs_a
+    eri *= dens_coeffs_b
+    return eri.sum(axis=(-2, -1))
+
+
+def _gamma_block(dens_exps_a, dens_coeffs_a, pos_a, dens_exps_b, dens_coeffs_b, pos_b):
+    """
+    Returns the Coulomb interaction between every pair of s densities of
+    set a and set b
+    """
+    r2 = np.sum((pos_a[:, None, :] - pos_b[None, :, :])**2, axis=-1)
+    return _gamma_primitive_sum(dens_exps_a[:, None, :, None], dens_exps_b[None, :, None, :],
+                                dens_coeffs_a[:, None, :, None], dens_coeffs_b[None, :, None, :], r2)
+
+
+def gamma_matrix(bas, cutoff=None, cache=None):
+    """
+    Returns the two-center Coulomb integrals gamma_AB = (s_A s_A|s_B s_B)
+    between the valence s functions of every pair of atoms
+
+    Parameters
+    ----------
+    bas : Basis
+        basis with a compact struct-of-arrays copy in bas.compact
+    cutoff : float, optional
+        distance in angstrom beyond which gamma_AB is replaced by its
+        point charge limit 1/R_AB. Only the pairs from a neighbor list are
+        integrated.
+    cache : integrals.cache.IntegralCache, optional
+        cache of atom pair integrals shared with other calculations
+
+    Returns
+    -------
+    gamma : np.ndarray
+        atom pair Coulomb matrix. Size: (n_atom, n_atom)
+    """
+    cb = bas.compact
+    s_funcs, centers = cb.valence_s_funcs()
+    exps = cb.exps[s_funcs]
+    coeffs = _normalized_coeffs(exps, cb.coeffs[s_funcs], cb.l[s_funcs])
+    pos = cb.pos[s_funcs]/bohr
+    n, n_prim = exps.shape
+    # the product of an s function with itself is a sum of s densities on
+    # the same center with exponents a_i + a_j and weights c_i c_j
+    dens_exps = (exps[:, :, None] + exps[:, None, :]).reshape(n, n_prim**2)
+    dens_coeffs = (coeffs[:, :, None] * coeffs[:, None, :]).reshape(n, n_prim**2)
+    gamma_s = np.zeros((n, n))
+    if cutoff is None and cache is None:
+        step = max(1, block_elements // (n*n_prim**4))
+        for start in range(0, n, step):
+            rows = slice(start, start + step)
+            gamma_s[rows] = _gamma_block(dens_exps[rows], dens_coeffs[rows], pos[rows],
+                                         dens_exps, dens_coeffs, pos)
+    else:
+        if cutoff is None:
+            a, b = np.triu_indices(n, k=1)
+        else:
+            step = max(1, block_elements // n)
+            # the self pairs on the diagonal are integrated below
+            with np.errstate(divide='ignore'):
+                for start in range(0, n, step):
+                    rows = slice(start, start + step)
+                    gamma_s[rows] = 1.0/np.sqrt(np.sum((pos[rows, None, :] - pos[None, :, :])**2, axis=-1))
+            a, b = neighbor_list(cb.pos[s_funcs], cutoff)
+        a = np.concatenate((np.arange(n), a))
+        b = np.concatenate((np.arange(n), b))
+        step = max(1, block_elements // n_prim**4)
+
+        def compute(pa, pb):
+            values = np.zeros(len(pa))
+            for start in range(0, len(pa), step):
+                ia = pa[start:start + step]
+                ib = pb[start:start + step]
+                r2 = np.sum((pos[ia] - pos[ib])**2, axis=-1)
+                values[start:start + step] = _gamma_primitive_sum(
+                    dens_exps[ia][:, :, None], dens_exps[ib][:, None, :],
+                    dens_coeffs[ia][:, :, None], dens_coeffs[ib][:, None, :], r2)
+            return values
+
+        if cache is None:
+            values = compute(a, b)
+        else:
+            types = cache.shell_types(_shell_descriptors(cb, cb.func_shell[s_funcs]))
+            # gamma is symmetric, so order each pair by shell type
+            swap = types[a] > types[b]
+            a, b = np.where(swap, b, a), np.where(swap, a, b)
+            R = np.sqrt(np.sum((cb.pos[s_funcs][a] - cb.pos[s_funcs][b])**2, axis=-1))
+            values = _cached_blocks(cache, 'gamma', types[a], types[b], R,
+                                    lambda i: compute(a[i], b[i]))
+        gamma_s[a, b] = values
+        gamma_s[b, a] = values
+    gamma = np.zeros((bas.mol.n_atom, bas.mol.n_atom))
+    gamma[np.ix_(centers, centers)] = gamma_s
+    return gamma
@@ -0,0 +1,172 @@
+"""
+On-disk store of integral matrices keyed by a hash of everything they
+depend on
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse as sparse
+
+
+class IntegralStore:
+    """
+    Directory of integral matrices. Each entry is a subdirectory named by
+    a hash key holding one .npy file per dense matrix, loaded back memory
+    mapped, or one .npz file per sparse matrix. Entries unused for the
+    longest time are deleted once the store grows beyond max_bytes.
+
+    Attributes
+    ----------
+    directory : string
+        store directory, created when missing
+    max_bytes : int
+        size bound of the store
+    mmap_mode : string or None
+        mode dense matrices are memory mapped with, None to read them
+    hits, misses : int
+        lookup counters of this instance
+    """
+
+    def __init__(self, directory, max_bytes=2**32, mmap_mode='r'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Returns a hex hash of arrays, strings and numbers
+
+        Parameters
+        ----------
+        parts :
+            what the stored matrices depend on. Arrays are hashed with their
+            dtype, shape and bytes, lists and tuples element by element, so
+            arrays inside them are hashed exactly too, and everything else
+            by repr.
+        """
+        h = hashlib.sha256()
+        IntegralStore.update_hash(h, parts)
+        return h.hexdigest()
+
+    @staticmethod
+    def update_hash(h, part):
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            h.update(repr((part.dtype.str, part.shape)).encode())
+            h.update(part.tobytes())
+        elif isinstance(part, (list, tuple)):
+            h.update('{}{}'.format(type(part).__name__, len(part)).encode())
+            for item in part:
+                IntegralStore.update_hash(h, item)
+        else:
+            h.update(repr(part).encode())
+        h.update(b'|')
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key, names):
+        """
+        Returns the matrices of an entry, or None when the entry or any of
+        the names is missing
+
+        Parameters
+        ----------
+        key : string
+            entry key
+        names : list
+            matrix names
+
+        Returns
+        -------
+        arrays : dict or None
+            matrices by name
+        """
+        path = self.path(key)
+        arrays = {}
+        for name in names:
+            fname = os.path.join(path, name)
+            if os.path.exists(fname + '.npy'):
+                arrays[name] = np.load(fname + '.npy', mmap_mode=self.mmap_mode)
+            elif os.path.exists(fname + '.npz'):
+                arrays[name] = sparse.load_npz(fname + '.npz').tocsr()
+            else:
+                self.misses += 1
+                return None
+        # the modification time of an entry marks its last use
+        os.utime(path)
+        self.hits += 1
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        Adds an entry, replacing any entry with the same key, and evicts
+        old entries beyond max_bytes
+
+        Parameters
+        ----------
+        key : string
+            entry key
+        arrays : dict
+            numpy arrays or scipy sparse matrices by name
+        """
+        tmp_path = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        for name, value in arrays.items():
+            fname = os.path.join(tmp_path, name)
+            if sparse.issparse(value):
+                sparse.save_npz(fname + '.npz', value.tocsr(), compressed=False)
+            else:
+                np.save(fname + '.npy', np.asarray(value))
+        path = self.path(key)
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        Returns (last use time, bytes, key) of every entry
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self.path(key)
+            if key.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                n_bytes = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.path.getmtime(path), n_bytes, key))
+            except OSError:
+                continue
+        return entries
+
+    def size(self):
+        return sum(n_bytes for mtime, n_bytes, key in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Deletes the least recently used entries until the store fits in
+        max_bytes. The entry named keep is never deleted.
+        """
+        entries = sorted(self.entries())
+        total = sum(n_bytes for mtime, n_bytes, key in entries)
+        for mtime, n_bytes, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.path(key), ignore_errors=True)
+            total -= n_bytes
+
+    def clear(self):
+        for mtime, n_bytes, key in self.entries():
+            shutil.rmtree(self.path(key), ignore_errors=True)
@@ -1,7 +1,10 @@
+import importlib
 import numpy as np
-from integrals import gaussian_integrals as gi
+from integrals import cache as integral_cache
 from methods.method import Method
+from methods.parameters import ElementParameters, load_parameters
 import scipy.linalg as spla
+import scipy.sparse as sparse
 # MATRIX ELEMENTS FROM Table I of doi:10.1063/1.1727227 in eV
 # avg_IP_EA_s = {
 #     "H" : 7.176,
@@ -66,6 +69,22 @@ beta = {
     "F": 1.433224E+00
 }
 
+# Named parameter sets, the first is the default
+parameter_sets = {
+    "CNDO/2": ElementParameters({
+        "avg_IP_EA_s": avg_IP_EA_s,
+        "avg_IP_EA_p": avg_IP_EA_p,
+        "beta": beta
+    }, name="CNDO/2")
+}
+
+# Modules providing overlap_matrix and gamma_matrix, imported on first use
+# so pyscf is only loaded when its backend is selected
+integral_backends = {
+    "numpy": "integrals.numpy_integrals",
+    "pyscf": "integrals.gaussian_integrals"
+}
+
 class CNDO(Method):
     """
     Class for CNDO
@@ -73,32 +92,104 @@ class CNDO(Method):
     Attributes
     ----------
     """
+    integral_names = ['S', 'gamma']
 
-    def __init__(self, mol, bas):
+    def __init__(self, mol, bas, integral_backend="numpy", parameters=None):
         Method.__init__(self, mol, bas)
         self.name = "CNDO/2"
+        self.zero_differential_overlap = True
+        if integral_backend not in integral_backends:
+            raise NotImplementedError(
+                'integral backend \'{}\' is unsupported. Accepted backends: {}'.format(
+                    integral_backend, str(list(integral_backends)).strip('[]')))
+        self.integral_backend = integral_backend
+        # ElementParameters, a name in parameter_sets, a json file or a
+        # dict of values replacing some CNDO/2 ones
+        self.parameters = load_parameters(parameters, parameter_sets)
+        # distance in angstrom beyond which overlaps are skipped and gamma
+        # is 1/R. With a cutoff S and H are stored as sparse matrices.
+        self.cutoff = None
+        # IntegralCache shared with other calculations, or True for the
+        # process wide integrals.cache.default_cache
+        self.integral_cache = None
+        self.setup_function_arrays()
+
+    def integral_options(self):
+        """
+        Returns the keyword arguments of the integral functions
+        """
+        options = {}
+        if self.cutoff is not None:
+            options['cutoff'] = self.cutoff
+        if self.integral_cache is True:
+            options['cache'] = integral_cache.default_cache
+        elif self.integral_cache:
+            options['cache'] = self.integral_cache
+        if options and self.integral_backend != "numpy":
+            raise NotImplementedError('{} requires the numpy integral backend'.format(
+                ' and '.join(options)))
+        return options
+
+    def integral_settings(self):
+        return (self.integral_backend, self.cutoff)
+
+    def parameter_settings(self):
+        return [(name, self.parameters[name]) for name in sorted(self.parameters.tables)]
+
+    def integrals(self):
+        """
+        Returns the module of the selected integral backend
+        """
+        return importlib.import_module(integral_backends[self.integral_backend])
 
     def overlap(self):
-        return None
+        options = self.integral_options()
+        with self.stats.track_cache(options.get('cache')):
+            self.S = self.integrals().overlap_matrix(self.bas, **options)
+        self.stats.count('overlap_elements', self.S.nnz if sparse.issparse(self.S) else self.S.size)
+
+    def setup_function_arrays(self):
+        """
+        Builds the per basis function arrays used by H_core and form_fock
+        """
+        cb = self.bas.compact
+        self.func_center = cb.center
+        # -1/2 (I + A) for the s or p shell of each function
+        Z_s = cb.Z[cb.l == 0]
+        Z_p = cb.Z[cb.l == 1]
+        self.func_IP_EA = np.zeros(cb.n_func)
+        self.func_IP_EA[cb.l == 0] = -self.parameters.values("avg_IP_EA_s", Z_s)
+        self.func_IP_EA[cb.l == 1] = -self.parameters.values("avg_IP_EA_p", Z_p)
+        self.func_beta = self.parameters.values("beta", cb.Z)
+        # valence core charge of each atom
+        self.Z_core = np.array(self.mol.at_num) - np.array(self.mol.num_elec_core)
+
+    def setup_fock(self):
+        if sparse.issparse(self.S):
+            # gamma_AB on the function pairs stored in S
+            S = self.S.tocoo()
+            self.gamma_funcs = sparse.coo_matrix(
+                (self.gamma[self.func_center[S.row], self.func_center[S.col]], (S.row, S.col)), shape=S.shape)
+        else:
+            # gamma_AB expanded to every pair of basis functions
+            self.gamma_funcs = self.gamma[np.ix_(self.func_center, self.func_center)]
 
     def H_core(self):
-        self.H = np.zeros((self.bas.n_func, self.bas.n_func))
-        if self.iteration_num == 1:
-            for i in range(self.bas.n_func):
-                if self.bas.funcs[i].center_symb in ['H']:
-                    self.H[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-                else:
-                    ang_mom = self.bas.funcs[i].angular_momentum[0]
-                    ang_mom += self.bas.funcs[i].angular_momentum[1]
-                    ang_mom += self.bas.funcs[i].angular_momentum[2]
-                    if (ang_mom == 0):
-                        self.H[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-                    else:
-                        self.H[i, i] = -avg_IP_EA_p[self.bas.funcs[i].center_symb]
-                for j in range(i+1, self.bas.n_func):
-                    beta_avg = 0.5*(beta[self.bas.funcs[i].center_symb] + beta[self.bas.funcs[j].center_symb])
-                    self.H[i, j] = beta_avg*gi.overlap(self.bas.funcs[i], self.bas.funcs[j])
-                    self.H[j, i] = self.H[i, j]
+        self.setup_fock()
+        # diagonal: U_mumu - sum_B!=A Z_B gamma_AB
+        # with U_mumu = -1/2 (I + A) - (Z_A - 1/2) gamma_AA
+        V_nuc = self.gamma @ self.Z_core
+        gamma_AA = np.diagonal(self.gamma)[self.func_center]
+        H_diag = self.func_IP_EA + 0.5*gamma_AA - V_nuc[self.func_center]
+        if sparse.issparse(self.S):
+            # off diagonal: beta_AB^0 S_munu
+            half_beta = sparse.diags(0.5*self.func_beta)
+            self.H = (half_beta @ self.S + self.S @ half_beta).tocsr()
+            self.H.setdiag(H_diag)
+        else:
+            # off diagonal: beta_AB^0 S_munu
+            self.H = 0.5*(self.func_beta[:, None] + self.func_beta[None, :]) * self.S
+            np.fill_diagonal(self.H, H_diag)
 
     def kinetic(self):
         return None
@@ -107,81 +198,44 @@ class CNDO(Method):
         return None
 
     def two_electron(self):
-        return None
+        options = self.integral_options()
+        with self.stats.track_cache(options.get('cache')):
+            self.gamma = self.integrals().gamma_matrix(self.bas, **options)
+        self.stats.count('gamma_elements', self.gamma.size)
+
+    def form_DM(self, out=None):
+        """
+        Forms the density matrix from the occupied orbitals as C_occ C_occ^T
 
-    def form_DM(self):
-        self.D = np.zeros((self.bas.n_func, self.bas.n_func))
-        for i in range(self.bas.n_func):
-            for j in range(self.bas.n_func):
-                for k in range((self.mol.num_val_elec)//2):
-                    self.D[i, j] += self.C[i, k] * self.C[j, k]
+        Parameters
+        ----------
+        out : np.ndarray, optional
+            preallocated (n_func, n_func) buffer to write the density into
+        """
+        C_occ = self.C[:, :self.mol.num_val_elec//2]
+        self.D = np.dot(C_occ, C_occ.T, out=out)
 
     def form_DM_on_centers(self):
-        self.D_centers = np.zeros((self.mol.n_atom))
-        for i in range(self.bas.n_func):
-            atom = self.bas.funcs[i].center
-            for k in range((self.mol.num_val_elec)//2):
-                self.D_centers[atom] += self.C[i, k] * self.C[i, k]
+        self.D_centers = np.bincount(self.func_center, weights=np.diagonal(self.D),
+                                     minlength=self.mol.n_atom)
 
     def diag_fock(self):
-        self.E_orbitals, self.C = spla.eigh(self.F)
+        self.E_orbitals, self.C = spla.eigh(self.F, subset_by_index=self.orbital_window())
 
     def form_fock(self):
-        self.F = np.zeros((self.bas.n_func, self.bas.n_func))
-        if self.iteration_num == 1:
-            # for i in range(self.bas.n_func):
-            #     if self.bas.funcs[i].center_symb in ['H']:
-            #         self.F[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-            #     else:
-            #         ang_mom = self.bas.funcs[i].angular_momentum[0]
-            #         ang_mom += self.bas.funcs[i].angular_momentum[1]
-            #         ang_mom += self.bas.funcs[i].angular_momentum[2]
-            #         if (ang_mom == 0):
-            #             self.F[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-            #         else:
-            #             self.F[i, i] = -avg_IP_EA_p[self.bas.funcs[i].center_symb]
-            #     for j in range(i+1, self.bas.n_func):
-            #         beta_avg = 0.5*(beta[self.bas.funcs[i].center_symb] + beta[self.bas.funcs[j].center_symb])
-            #         self.F[i, j] = beta_avg*gi.overlap(self.bas.funcs[i], self.bas.funcs[j])
-            #         self.F[j, i] = self.F[i, j]
-            pass
+        # D holds half the closed shell density so P = 2 D
+        self.form_DM_on_centers()
+        # -1/2 P_munu gamma_AB for every pair, including mu == nu
+        if sparse.issparse(self.H):
+            # only the pairs within the cutoff
+            self.F = self.H.toarray()
+            g = self.gamma_funcs
+            self.F[g.row, g.col] -= self.D[g.row, g.col] * g.data
         else:
-            self.F += self.H
-            self.form_DM_on_centers()
-            for i in range(self.bas.n_func):
-                if self.bas.funcs[i].center_symb in ['H']:
-                    self.F[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-                    gamma_AA = gi.twoelec(self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[i])
-                    center_i = self.bas.funcs[i].center
-                    self.F[i, i] += ((self.D_centers[center_i] - self.mol.at_num[center_i]) - (0.5*(self.D[i,i] - 1))) * gamma_AA
-                    for j in range(self.bas.n_func):
-                        center_j = self.bas.funcs[j].center
-                        if center_i != center_j:
-                            gamma_AB = gi.twoelec(self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[j], self.bas.funcs[j])
-                            self.F[i, j] += (self.D_centers[center_j] - self.mol.at_num[center_j]) * gamma_AA
-                            self.F[j, i] = self.F[i, j]
-                else:
-                    ang_mom = self.bas.funcs[i].angular_momentum[0]
-                    ang_mom += self.bas.funcs[i].angular_momentum[1]
-                    ang_mom += self.bas.funcs[i].angular_momentum[2]
-                    if (ang_mom == 0):
-                        self.F[i, i] = -avg_IP_EA_s[self.bas.funcs[i].center_symb]
-                    else:
-                        self.F[i, i] = -avg_IP_EA_p[self.bas.funcs[i].center_symb]
-                    gamma_AA = gi.twoelec(self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[i])
-                    center_i = self.bas.funcs[i].center
-                    self.F[i, i] += ((self.D_centers[center_i] - self.mol.at_num[center_i]) - (0.5*(self.D[i,i] - 1))) * gamma_AA
-                    for j in range(self.bas.n_func):
-                        center_j = self.bas.funcs[j].center
-                        if center_i != center_j:
-                            gamma_AB = gi.twoelec(self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[j], self.bas.funcs[j])
-                            self.F[i, j] += (self.D_centers[center_j] - self.mol.at_num[center_j]) * gamma_AA
-                for j in range(i+1,self.bas.n_func):
-                    S_munu = gi.overlap(self.bas.funcs[i], self.bas.funcs[j])
-                    gamma_AB = gi.twoelec(self.bas.funcs[i], self.bas.funcs[i], self.bas.funcs[j], self.bas.funcs[j])
-                    beta_avg = 0.5*(beta[self.bas.funcs[i].center_symb] + beta[self.bas.funcs[j].center_symb])
-                    self.F[i, j] = (beta_avg*S_munu) - (0.5 * self.D[i,j] * gamma_AB)
-                    self.F[j, i] = self.F[i, j]
+            self.F = self.H - self.D * self.gamma_funcs
+        # sum_B P_BB gamma_AB on the diagonal
+        V_elec = 2.0 * (self.gamma @ self.D_centers)
+        self.F[np.diag_indices_from(self.F)] += V_elec[self.func_center]
 
     def generate_basis(self):
         self.bas = None
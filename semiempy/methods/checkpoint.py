@@ -0,0 +1,84 @@
+"""
+Reading and writing SCF checkpoints as directories of .npy files, which
+are memory mapped when read back
+"""
+import json
+import os
+import shutil
+import numpy as np
+import scipy.sparse as sparse
+
+
+def write_checkpoint(fname, arrays, state):
+    """
+    Writes arrays and a JSON serializable state to a checkpoint directory
+    holding state.json, one .npy file per dense array and one .npz file per
+    sparse matrix. The directory is written next to fname and moved over
+    it, so an interrupted write leaves the previous checkpoint intact.
+
+    Parameters
+    ----------
+    fname : string
+        checkpoint directory name
+    arrays : dict
+        numpy arrays or scipy sparse matrices by name. None values are
+        skipped.
+    state : dict
+        JSON serializable iteration state
+    """
+    tmp_fname = fname + '.tmp'
+    old_fname = fname + '.old'
+    shutil.rmtree(tmp_fname, ignore_errors=True)
+    os.makedirs(tmp_fname)
+    for name, value in arrays.items():
+        if value is None:
+            continue
+        path = os.path.join(tmp_fname, name)
+        if sparse.issparse(value):
+            sparse.save_npz(path + '.npz', value.tocsr(), compressed=False)
+        else:
+            np.save(path + '.npy', np.asarray(value))
+    with open(os.path.join(tmp_fname, 'state.json'), 'w') as f:
+        json.dump(state, f)
+    # a directory cannot be renamed over another one, so the previous
+    # checkpoint is moved aside first and read_checkpoint falls back to it
+    shutil.rmtree(old_fname, ignore_errors=True)
+    if os.path.exists(fname):
+        os.rename(fname, old_fname)
+    os.rename(tmp_fname, fname)
+    shutil.rmtree(old_fname, ignore_errors=True)
+
+
+def read_checkpoint(fname, mmap_mode='r'):
+    """
+    Reads a checkpoint written by write_checkpoint
+
+    Parameters
+    ----------
+    fname : string
+        checkpoint directory name
+    mmap_mode : string or None
+        mode dense arrays are memory mapped with, None to read them
+
+    Returns
+    -------
+    arrays : dict
+        numpy arrays and scipy csr matrices by name
+    state : dict
+        iteration state
+    """
+    if not os.path.exists(fname) and os.path.exists(fname + '.old'):
+        # interrupted between moving the previous checkpoint aside and
+        # moving the new one in
+        fname = fname + '.old'
+    with open(os.path.join(fname, 'state.json')) as f:
+        state = json.load(f)
+    arrays = {}
+    for entry in sorted(os.listdir(fname)):
+        name, extension = os.path.splitext(entry)
+        path = os.path.join(fname, entry)
+        if extension == '.npy':
+            arrays[name] = np.load(path, mmap_mode=mmap_mode)
+        elif extension == '.npz':
+            arrays[name] = sparse.load_npz(path).tocsr()
+    return arrays, state
@@ -0,0 +1,82 @@
+"""
+Density matrices straight from the Fock matrix without diagonalization
+"""
+import numpy as np
+import scipy.sparse as sparse
+
+
+def trace(A):
+    return A.diagonal().sum()
+
+
+def gershgorin_bounds(F):
+    """
+    Returns lower and upper bounds of the eigenvalues of a symmetric matrix
+    """
+    diag = F.diagonal()
+    radius = np.asarray(abs(F).sum(axis=1)).ravel() - np.abs(diag)
+    return np.min(diag - radius), np.max(diag + radius)
+
+
+def sp2_purification(F, n_occ, tol=1e-10, max_iter=100):
+    """
+    Trace correcting second order spectral projection (SP2) purification of
+    Niklasson (doi:10.1103/PhysRevB.66.155115)
+
+    F is scaled so its eigenvalues lie in [0, 1] with the lowest orbitals
+    near 1. Each step applies D^2 or 2D - D^2, whichever brings Tr(D)
+    closer to n_occ. Both map [0, 1] onto itself, so unlike canonical
+    purification the iteration stays stable for small HOMO-LUMO gaps and
+    converges to the projector on the n_occ lowest orbitals in a number of
+    steps growing with the logarithm of the inverse gap. Only matrix
+    products are needed, so sparse matrices stay sparse as long as the
+    density is short ranged.
+
+    Parameters
+    ----------
+    F : np.ndarray or scipy.sparse matrix
+        Fock matrix in an orthonormal basis. Size: (n, n)
+    n_occ : int
+        number of doubly occupied orbitals
+    tol : float
+        convergence threshold on the idempotency error Tr(D - D^2)
+    max_iter : int
+        maximum number of purification steps
+
+    Returns
+    -------
+    D : np.ndarray or scipy.sparse matrix
+        half density matrix sum_occ C C^T. Size: (n, n)
+    n_iter : int
+        number of purification steps taken
+    converged : bool
+        whether Tr(D - D^2) fell below tol, or stopped falling within
+        1e3 tol, before max_iter steps
+    """
+    n = F.shape[0]
+    is_sparse = sparse.issparse(F)
+    identity = sparse.identity(n, format='csr') if is_sparse else np.eye(n)
+    if n_occ <= 0:
+        return 0.0*identity, 0, True
+    if n_occ >= n:
+        return identity, 0, True
+    E_min, E_max = gershgorin_bounds(F)
+    D = (E_max*identity - F)/(E_max - E_min)
+    error_last = np.inf
+    n_iter = 0
+    converged = False
+    for n_iter in range(1, max_iter + 1):
+        D2 = D @ D
+        tr_D = trace(D)
+        tr_D2 = trace(D2)
+        error = tr_D - tr_D2
+        # stop once idempotent or when rounding keeps the error from falling
+        if abs(error) < tol or (abs(error) < 1e3*tol and abs(error) >= abs(error_last)):
+            converged = True
+            break
+        error_last = error
+        if abs(tr_D2 - n_occ) < abs(2.0*tr_D - tr_D2 - n_occ):
+            D = D2
+        else:
+            D = 2.0*D - D2
+    return D, n_iter, converged
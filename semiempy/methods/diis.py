@@ -0,0 +1,163 @@
+import numpy as np
+
+
+class DIIS:
+    """
+    Pulay's direct inversion in the iterative subspace (doi:10.1016/0009-2614(80)80396-4)
+
+    The Fock matrix is extrapolated as the linear combination of previous
+    Fock matrices that minimizes the norm of the combined error vectors
+    (the commutator of F and D) under the constraint that the coefficients
+    sum to one.
+
+    Attributes
+    ----------
+    max_vecs : int
+        maximum number of Fock and error matrices kept in the history
+    focks : list
+        previous Fock matrices
+    errors : list
+        previous error matrices
+    min_error : float
+        largest error element below which a Fock matrix is left out of the
+        history. A density commuting with F, like the empty density or a
+        multiple of the identity, has a vanishing error without being self
+        consistent and would take all the weight of the extrapolation.
+    """
+
+    def __init__(self, max_vecs=8, min_error=1e-10):
+        self.max_vecs = max_vecs
+        self.min_error = min_error
+        self.focks = []
+        self.errors = []
+
+    def reset(self):
+        self.focks = []
+        self.errors = []
+
+    def push(self, F, error):
+        """
+        Adds a Fock and error matrix to the history, dropping the oldest
+        entry once max_vecs is reached
+        """
+        self.focks.append(np.copy(F))
+        self.errors.append(np.copy(error))
+        if len(self.focks) > self.max_vecs:
+            self.focks.pop(0)
+            self.errors.pop(0)
+
+    def extrapolate(self, F, error, **kwargs):
+        """
+        Adds F to the history and returns the extrapolated Fock matrix
+
+        Parameters
+        ----------
+        F : np.ndarray
+            Fock matrix built from the current density
+        error : np.ndarray
+            error matrix of the current iteration
+
+        Returns
+        -------
+        F : np.ndarray
+            extrapolated Fock matrix
+        """
+        if np.max(np.abs(error)) < self.min_error:
+            return F
+        self.push(F, error)
+        n = len(self.focks)
+        if n < 2:
+            return F
+        B = -np.ones((n+1, n+1))
+        B[n, n] = 0.0
+        for i in range(n):
+            for j in range(i, n):
+                B[i, j] = B[j, i] = np.sum(self.errors[i] * self.errors[j])
+        rhs = np.zeros(n+1)
+        rhs[n] = -1.0
+        # lstsq handles the near singular B of an almost converged history
+        coeffs = np.linalg.lstsq(B, rhs, rcond=None)[0][:n]
+        return sum(c * F_i for c, F_i in zip(coeffs, self.focks))
+
+
+class EDIIS(DIIS):
+    """
+    Energy DIIS of Kudin, Scuseria and Cances (doi:10.1063/1.1470195)
+
+    The Fock matrix is extrapolated with the convex combination of previous
+    Fock matrices that minimizes the quadratic energy model built from the
+    previous densities, Fock matrices and energies. This is robust far from
+    convergence, so once the largest error element falls below
+    diis_threshold the Pulay DIIS extrapolation is used instead.
+
+    Attributes
+    ----------
+    densities : list
+        previous density matrices
+    energies : list
+        previous electronic energies
+    diis_threshold : float
+        largest error element below which Pulay DIIS is used
+    """
+
+    def __init__(self, max_vecs=8, diis_threshold=1e-2, min_error=1e-10):
+        DIIS.__init__(self, max_vecs, min_error)
+        self.diis_threshold = diis_threshold
+        self.densities = []
+        self.energies = []
+
+    def reset(self):
+        DIIS.reset(self)
+        self.densities = []
+        self.energies = []
+
+    def extrapolate(self, F, error, D=None, E=None):
+        """
+        Adds F to the history and returns the extrapolated Fock matrix
+
+        Parameters
+        ----------
+        F : np.ndarray
+            Fock matrix built from the current density
+        error : np.ndarray
+            error matrix of the current iteration
+        D : np.ndarray
+            density matrix F was built from
+        E : float
+            electronic energy of D
+
+        Returns
+        -------
+        F : np.ndarray
+            extrapolated Fock matrix
+        """
+        if np.max(np.abs(error)) < self.min_error:
+            return F
+        self.densities.append(np.copy(D))
+        self.energies.append(E)
+        if len(self.densities) > self.max_vecs:
+            self.densities.pop(0)
+            self.energies.pop(0)
+        if np.max(np.abs(error)) < self.diis_threshold:
+            return DIIS.extrapolate(self, F, error)
+        self.push(F, error)
+        n = len(self.focks)
+        if n < 2:
+            return F
+        energies = np.array(self.energies)
+        # Tr((D_i - D_j)(F_i - F_j)) for the half density D
+        DF = np.array([[np.sum(D_i * F_j) for F_j in self.focks] for D_i in self.densities])
+        M = np.diag(DF)[:, None] + np.diag(DF)[None, :] - DF - DF.T
+
+        # c_i = t_i^2 / sum t^2 keeps the coefficients convex
+        def energy(t):
+            c = t**2 / np.sum(t**2)
+            return np.dot(c, energies) - 0.5 * c @ M @ c
+
+        # scipy.optimize is only imported once EDIIS is used
+        import scipy.optimize as spo
+        t0 = np.ones(n)
+        t0[-1] = 2.0
+        t = spo.minimize(energy, t0, method='BFGS').x
+        coeffs = t**2 / np.sum(t**2)
+        return sum(c * F_i for c, F_i in zip(coeffs, self.focks))
@@ -1,7 +1,14 @@
 import numpy as np
+import scipy.linalg as spla
+import scipy.sparse as sparse
 import time
 from utils.molecule_utils import distance
 from utils.general_io import print_header
+from methods.diis import DIIS, EDIIS
+from methods.stats import RunStats
+from methods.observers import ConsoleObserver
+from methods.checkpoint import write_checkpoint, read_checkpoint
+from methods.density import sp2_purification
 from abc import ABC, abstractmethod
 
 class Method(ABC):
@@ -11,6 +18,8 @@ class Method(ABC):
     Attributes
     ----------
     """
+    # integral matrices saved in checkpoints so a restart skips them
+    integral_names = ['S']
 
     def __init__(self, mol, bas):
         self.mol = mol
@@ -18,6 +27,48 @@ class Method(ABC):
         self.iteration_max = 100
         self.convergence_E = 1e-9
         self.convergence_DM = 1e-5
+        # largest element of FDS - SDF of the unextrapolated Fock matrix,
+        # checked when an accelerator is active. An extrapolated Fock
+        # matrix can stop changing while the density is far from self
+        # consistent.
+        self.convergence_error = 1e-5
+        self.reset_iterations()
+        # write each new density into the buffer of the one before last
+        # instead of allocating a new matrix every iteration
+        self.reuse_DM_buffers = True
+        # convergence accelerator: None, "diis" or "ediis". EDIIS hands over
+        # to Pulay DIIS near convergence. Pulay DIIS from the first iteration
+        # can lock onto an excited SCF solution, e.g. graphene flakes from the
+        # huckel guess.
+        self.scf_accelerator = "ediis"
+        self.diis_max_vecs = 8
+        # methods neglecting differential overlap use FD - DF as DIIS error
+        self.zero_differential_overlap = False
+        # initial density guess: "zero", "sad" or "huckel"
+        self.guess = "huckel"
+        # Wolfsberg-Helmholz constant of the huckel guess
+        self.huckel_K = 1.75
+        # how each new density is found from the Fock matrix: "eigh" (all
+        # orbitals), "occupied" (only the occupied orbitals and the LUMO) or
+        # "purification" (SP2 purification, no orbitals)
+        self.density_solver = "eigh"
+        self.purification_tol = 1e-10
+        self.purification_max_iter = 100
+        # timings and counters of the last run
+        self.stats = RunStats()
+        # receivers of the start, iteration and finish events, see
+        # methods.observers. An empty list runs silently.
+        self.observers = [ConsoleObserver()]
+        # directory the SCF state is written to after the integrals, every
+        # checkpoint_interval iterations and at the end of each run, see
+        # methods.checkpoint
+        self.checkpoint_file = None
+        self.checkpoint_interval = 10
+        # integrals.store.IntegralStore reusing the integrals and core
+        # Hamiltonian of earlier runs on the same geometry and basis
+        self.integral_store = None
+
+    def reset_iterations(self):
         # loop variables
         self.iteration_start_time = 0
         self.iteration_num = 0
@@ -25,9 +76,41 @@ class Method(ABC):
         self.E_elec = 0.0
         self.iteration_E_diff = 0.0
         self.iteration_rmsc_dm = 0.0
+        self.iteration_error = 0.0
         self.stop = False
         self.converged = False
         self.exceeded_iterations = False
+        self.D_last = None
+
+    def set_molecule(self, mol):
+        """
+        Prepares the method for a new geometry of the same molecule, e.g. the
+        next frame of a trajectory. The basis layout and per function
+        parameters are kept and the integrals are recomputed by the next run.
+
+        Parameters
+        ----------
+        mol : Molecule
+            molecule with the same atoms in the same order
+        """
+        self.bas.update_geometry(mol)
+        self.mol = mol
+        self.reset_iterations()
+
+    def notify(self, kind, event):
+        """
+        Sends an event to every observer
+
+        Parameters
+        ----------
+        kind : string
+            'start', 'iteration' or 'finish'
+        event : dict
+            event data
+        """
+        event = dict({'event': kind}, **event)
+        for observer in self.observers:
+            getattr(observer, kind)(self, event)
 
     def print_start_iterations(self):
         print_header()
@@ -63,6 +146,80 @@ class Method(ABC):
     def H_core(self):
         pass
 
+    def setup_fock(self):
+        """
+        Builds what form_fock needs from the integrals besides H. Called by
+        H_core and when H is loaded from the integral store.
+        """
+        pass
+
+    def integral_settings(self):
+        """
+        Returns the method settings the integrals depend on besides the
+        geometry and basis, e.g. the integral backend
+        """
+        return ()
+
+    def parameter_settings(self):
+        """
+        Returns the method parameters H_core depends on
+        """
+        return ()
+
+    def integral_key(self):
+        """
+        Returns the integral store key of the geometry, relative to the
+        first atom so translated copies share it, the basis and the
+        integral settings
+        """
+        cb = self.bas.compact
+        xyz = np.round(cb.xyz - cb.xyz[:1], 10)
+        return self.integral_store.key(type(self).__name__, xyz, cb.Z, cb.ang_mom, cb.exps, cb.coeffs,
+                                       self.integral_settings())
+
+    def evaluate_integrals(self):
+        """
+        Evaluates the integrals, or loads them from the integral store
+        """
+        store = self.integral_store
+        if store is not None:
+            key = self.integral_key()
+            with self.stats.phase('load_integrals', self):
+                arrays = store.load(key, self.integral_names)
+            if arrays is not None:
+                self.stats.count('integral_store_hits')
+                for name, value in arrays.items():
+                    setattr(self, name, value)
+                return
+            self.stats.count('integral_store_misses')
+        with self.stats.phase('overlap', self):
+            self.overlap()
+        with self.stats.phase('two_electron', self):
+            self.two_electron()
+        if store is not None:
+            with self.stats.phase('store_integrals'):
+                store.save(key, {name: getattr(self, name) for name in self.integral_names})
+
+    def core_hamiltonian(self):
+        """
+        Builds the core Hamiltonian, or loads it from the integral store
+        """
+        store = self.integral_store
+        if store is not None:
+            key = store.key(self.integral_key(), self.parameter_settings())
+            with self.stats.phase('load_integrals', self):
+                arrays = store.load(key, ['H'])
+            if arrays is not None:
+                self.H = arrays['H']
+                with self.stats.phase('setup_fock', self):
+                    self.setup_fock()
+                return
+        with self.stats.phase('H_core', self):
+            self.H_core()
+        if store is not None:
+            with self.stats.phase('store_integrals'):
+                store.save(key, {'H': self.H})
+
     @abstractmethod
     def kinetic(self):
         pass
@@ -84,11 +241,54 @@ class Method(ABC):
         pass
 
     @abstractmethod
-    def form_DM(self):
+    def form_DM(self, out=None):
         pass
 
+    def check_closed_shell(self):
+        if self.mol.num_val_elec % 2 != 0 or getattr(self.mol, 'multiplicity', 1) != 1:
+            raise NotImplementedError(
+                '{} is closed shell only, the molecule has {} valence electrons and multiplicity {}'.format(
+                    self.name, self.mol.num_val_elec, getattr(self.mol, 'multiplicity', 1)))
+
+    def check_density_solver(self):
+        if self.density_solver not in ("eigh", "occupied", "purification"):
+            raise NotImplementedError(
+                'density solver \'{}\' is unsupported. Accepted solvers: \'eigh\', \'occupied\', \'purification\''.format(
+                    self.density_solver))
+        if self.density_solver == "purification" and not self.zero_differential_overlap:
+            raise NotImplementedError('purification requires an orthonormal basis (zero differential overlap)')
+
+    def orbital_window(self):
+        """
+        Returns the index range of the orbitals diag_fock computes
+        """
+        if self.density_solver == "occupied":
+            return [0, min(self.mol.num_val_elec//2, self.bas.n_func - 1)]
+        return None
+
+    def purify_fock(self):
+        """
+        Forms the density matrix from the Fock matrix by SP2 purification.
+        No orbitals are computed. Raises a RuntimeError when the density is
+        not idempotent after purification_max_iter steps.
+        """
+        self.D, n_iter, converged = sp2_purification(self.F, self.mol.num_val_elec//2,
+                                                     self.purification_tol, self.purification_max_iter)
+        self.stats.count('purification_steps', n_iter)
+        if not converged:
+            error = np.sum(self.D.diagonal()) - np.sum((self.D @ self.D).diagonal())
+            raise RuntimeError(
+                'SP2 purification left Tr(D - D^2) = {:.3g} after {} steps in iteration {}. '
+                'Raise purification_max_iter or use another density_solver.'.format(
+                    error, n_iter, self.iteration_num))
+        self.C = None
+        self.E_orbitals = None
+
     def calculate_E_elec(self):
-        self.E_elec = np.sum(np.multiply(self.D, (self.H + self.F)))
+        if sparse.issparse(self.H):
+            self.E_elec = self.H.multiply(self.D).sum() + np.sum(np.multiply(self.D, self.F))
+        else:
+            self.E_elec = np.sum(np.multiply(self.D, (self.H + self.F)))
 
     def calculate_E_total(self):
         self.E_total = self.E_elec + self.mol.E_nuc
@@ -99,47 +299,255 @@ class Method(ABC):
         # rms change of density matrix
         self.iteration_rmsc_dm = np.sqrt(np.sum((self.D - self.D_last)**2))
         # check stopping criteria
-        if(np.abs(self.iteration_E_diff) < self.convergence_E and self.iteration_rmsc_dm < self.convergence_DM):
+        if(np.abs(self.iteration_E_diff) < self.convergence_E and self.iteration_rmsc_dm < self.convergence_DM
+                and (self.accelerator is None or self.iteration_error < self.convergence_error)):
             self.converged = True
             self.stop = True
-        elif(self.iteration_num == self.iteration_max):
+        elif(self.iteration_num >= self.iteration_max):
             self.exceeded_iterations = True
             self.stop = True
 
+    def make_accelerator(self):
+        if self.scf_accelerator is None:
+            return None
+        elif self.scf_accelerator == "diis":
+            return DIIS(self.diis_max_vecs)
+        elif self.scf_accelerator == "ediis":
+            return EDIIS(self.diis_max_vecs)
+        raise NotImplementedError(
+            'SCF accelerator \'{}\' is unsupported. Accepted accelerators: None, \'diis\', \'ediis\''.format(
+                self.scf_accelerator))
+
+    def scf_error(self):
+        # commutator FDS - SDF, which is FD - DF for an identity metric
+        FD = self.F @ self.D
+        if self.zero_differential_overlap:
+            return FD - FD.T
+        FDS = np.asarray(self.S.T @ FD.T).T if sparse.issparse(self.S) else FD @ self.S
+        return FDS - FDS.T
+
+    def accelerate_fock(self):
+        error = self.scf_error()
+        self.iteration_error = float(np.max(np.abs(error)))
+        self.F = self.accelerator.extrapolate(self.F, error, D=self.D, E=self.E_elec)
+
     def run_iteration(self):
         # store last iteration and increment counters
         self.iteration_start_time = time.time()
         self.iteration_num += 1
+        self.stats.count('iterations')
         self.E_elec_last = self.E_elec
-        self.D_last = np.copy(self.D)
+        D_buffer = self.D_last if self.reuse_DM_buffers else None
+        self.D_last = self.D
         # build fock matrix
-        self.form_fock()
-        # solve the generalized eigenvalue problem
-        self.diag_fock()
-        # compute new density matrix
-        self.form_DM()
-        # calculate electronic energy
-        self.calculate_E_elec()
+        with self.stats.phase('form_fock', self):
+            self.form_fock()
+        # calculate electronic energy of the density the fock matrix was built from
+        with self.stats.phase('calculate_E_elec'):
+            self.calculate_E_elec()
+        # extrapolate the fock matrix from previous iterations
+        if self.accelerator is not None:
+            with self.stats.phase('accelerate_fock', self):
+                self.accelerate_fock()
+        if self.density_solver == "purification":
+            # density straight from the fock matrix
+            with self.stats.phase('purify_fock', self):
+                self.purify_fock()
+        else:
+            # solve the generalized eigenvalue problem
+            with self.stats.phase('diag_fock', self):
+                self.diag_fock()
+            # compute new density matrix
+            with self.stats.phase('form_DM', self):
+                self.form_DM(out=D_buffer)
         self.iteration_end_time = time.time()
-        self.print_iteration()
 
-    def guess_DM(self):
-        # for now just initialize with zeros
+    def guess_DM_zero(self):
         self.D = np.zeros((self.bas.n_func, self.bas.n_func))
 
-    def run(self):
+    def sad_diagonal(self):
+        """
+        Returns the diagonal of a superposition of atomic densities. The
+        valence electrons of each atom fill its s functions before its p
+        functions, each shell spread evenly over its functions, so the
+        guess of e.g. a hydrocarbon is not a multiple of the identity,
+        which commutes with every Fock matrix.
+        """
+        cb = self.bas.compact
+        n_val = (np.array(self.mol.at_num) - np.array(self.mol.num_elec_core))[cb.center]
+        is_s = cb.l == 0
+        n_s = np.bincount(cb.center, weights=is_s, minlength=self.mol.n_atom)[cb.center]
+        n_p = np.bincount(cb.center, weights=~is_s, minlength=self.mol.n_atom)[cb.center]
+        s_elec = np.minimum(n_val, 2.0*n_s)
+        occ = np.where(is_s, s_elec/np.maximum(n_s, 1), (n_val - s_elec)/np.maximum(n_p, 1))
+        # D holds half the density and has one electron pair per occupied orbital
+        return occ * (self.mol.num_val_elec//2) / np.sum(occ)
+
+    def guess_DM_sad(self):
+        self.D = np.diag(self.sad_diagonal())
+
+    def guess_DM_huckel(self):
+        # generalized Wolfsberg-Helmholz H_munu = K/2 (H_mumu + H_nunu) S_munu
+        # on the diagonal of the Fock matrix of the atomic densities. The core
+        # Hamiltonian diagonal holds the unscreened attraction of all other
+        # nuclei, which misorders the guess orbitals of larger molecules.
+        self.guess_DM_sad()
+        self.form_fock()
+        H_diag = np.array(self.F.diagonal())
+        S = self.S.toarray() if sparse.issparse(self.S) else self.S
+        H_huckel = 0.5 * self.huckel_K * (H_diag[:, None] + H_diag[None, :]) * S
+        np.fill_diagonal(H_huckel, H_diag)
+        if self.zero_differential_overlap:
+            self.E_orbitals, self.C = np.linalg.eigh(H_huckel)
+        else:
+            self.E_orbitals, self.C = spla.eigh(H_huckel, self.S)
+        self.form_DM()
+
+    def guess_DM(self, D_guess=None):
+        """
+        Sets the initial density matrix
+
+        Parameters
+        ----------
+        D_guess : np.ndarray, optional
+            density from a previous calculation, e.g. at a nearby geometry.
+            A smaller matrix, e.g. from a fragment whose atoms come first in
+            this molecule, fills the leading block and the remaining
+            functions start from the superposition of atomic densities.
+        """
+        if D_guess is not None:
+            D_guess = np.asarray(D_guess)
+            n = D_guess.shape[0]
+            if D_guess.shape != (n, n) or n > self.bas.n_func:
+                raise ValueError('density guess of shape {} does not fit {} basis functions'.format(
+                    D_guess.shape, self.bas.n_func))
+            self.D = np.diag(self.sad_diagonal())
+            self.D[:n, :n] = D_guess
+        elif self.guess == "zero":
+            self.guess_DM_zero()
+        elif self.guess == "sad":
+            self.guess_DM_sad()
+        elif self.guess == "huckel":
+            self.guess_DM_huckel()
+        else:
+            raise NotImplementedError(
+                'density guess \'{}\' is unsupported. Accepted guesses: \'zero\', \'sad\', \'huckel\''.format(
+                    self.guess))
+
+    def save_checkpoint(self, fname=None):
+        """
+        Writes the integrals, density, orbitals and iteration state to a
+        checkpoint file
+
+        Parameters
+        ----------
+        fname : string, optional
+            checkpoint directory name. Defaults to checkpoint_file.
+        """
+        arrays = {name: getattr(self, name, None) for name in self.integral_names}
+        arrays['D'] = self.D
+        arrays['C'] = getattr(self, 'C', None)
+        arrays['E_orbitals'] = getattr(self, 'E_orbitals', None)
+        arrays['xyz'] = np.asarray(self.mol.xyz, dtype=float)
+        state = {
+            'method': self.name,
+            'n_func': self.bas.n_func,
+            'iteration_num': self.iteration_num,
+            'E_elec': float(self.E_elec),
+            'iteration_E_diff': float(self.iteration_E_diff),
+            'iteration_rmsc_dm': float(self.iteration_rmsc_dm),
+            'iteration_error': float(self.iteration_error),
+            'converged': bool(self.converged)
+        }
+        write_checkpoint(fname if fname is not None else self.checkpoint_file, arrays, state)
+
+    def load_checkpoint(self, fname):
+        """
+        Restores the integrals, density, orbitals and iteration state from
+        a checkpoint of the same method, basis and geometry. The integrals
+        stay memory mapped from the checkpoint files.
+
+        Parameters
+        ----------
+        fname : string
+            checkpoint directory written by save_checkpoint
+        """
+        arrays, state = read_checkpoint(fname)
+        if state['method'] != self.name or state['n_func'] != self.bas.n_func:
+            raise ValueError('checkpoint {} holds {} with {} basis functions, not {} with {}'.format(
+                fname, state['method'], state['n_func'], self.name, self.bas.n_func))
+        if arrays['xyz'].shape != np.shape(self.mol.xyz) or not np.allclose(arrays['xyz'], self.mol.xyz):
+            raise ValueError('checkpoint {} was written for a different geometry'.format(fname))
+        for name in self.integral_names:
+            setattr(self, name, arrays[name])
+        # the density and orbitals are updated in place by the SCF
+        self.D = np.array(arrays['D'])
+        if 'C' in arrays:
+            self.C = np.array(arrays['C'])
+            self.E_orbitals = np.array(arrays['E_orbitals'])
+        self.iteration_num = state['iteration_num']
+        self.E_elec = state['E_elec']
+        self.iteration_E_diff = state['iteration_E_diff']
+        self.iteration_rmsc_dm = state['iteration_rmsc_dm']
+        self.iteration_error = state.get('iteration_error', 0.0)
+
+    def run(self, D_guess=None, restart=None):
+        """
+        Runs the SCF
+
+        Parameters
+        ----------
+        D_guess : np.ndarray, optional
+            initial density, see guess_DM
+        restart : string, optional
+            checkpoint directory to resume from. Its integrals are reused and
+            the SCF continues from its density and iteration count.
+        """
         self.start_time = time.time()
-        self.print_start_iterations()
-        self.guess_DM()
-        self.H_core()
+        self.stats = RunStats()
+        self.check_closed_shell()
+        self.notify('start', {'method': self.name, 'n_atom': self.mol.n_atom, 'n_func': self.bas.n_func})
+        if restart is not None:
+            self.reset_iterations()
+            with self.stats.phase('load_checkpoint', self):
+                self.load_checkpoint(restart)
+        else:
+            self.evaluate_integrals()
+        self.core_hamiltonian()
+        if restart is None:
+            with self.stats.phase('guess_DM', self):
+                self.guess_DM(D_guess)
+            if self.checkpoint_file is not None:
+                with self.stats.phase('checkpoint'):
+                    self.save_checkpoint()
+        self.accelerator = self.make_accelerator()
+        self.check_density_solver()
         while (not self.stop):
             self.run_iteration()
-            self.check_stop()
+            with self.stats.phase('check_stop'):
+                self.check_stop()
+            # after check_stop so the changes belong to this iteration
+            self.notify('iteration', {
+                'iteration': self.iteration_num,
+                'time': self.iteration_end_time - self.iteration_start_time,
+                'rmsc_dm': float(self.iteration_rmsc_dm),
+                'E_diff': float(self.iteration_E_diff),
+                'error': float(self.iteration_error),
+                'E_elec': float(self.E_elec)
+            })
+            if (self.checkpoint_file is not None
+                    and (self.stop or self.iteration_num % self.checkpoint_interval == 0)):
+                with self.stats.phase('checkpoint'):
+                    self.save_checkpoint()
         self.calculate_E_total()
         self.end_time = time.time()
-        if (self.stop and self.converged):
-            self.print_success()
-        elif (self.stop and self.exceeded_iterations):
-            self.print_exceeded_iterations()
-        else:
-            self.print_error()
+        self.stats.phases['run'] = {'time': self.end_time - self.start_time, 'calls': 1}
+        self.notify('finish', {
+            'converged': bool(self.converged),
+            'exceeded_iterations': bool(self.exceeded_iterations),
+            'iterations': self.iteration_num,
+            'E_elec': float(self.E_elec),
+            'E_nuc': float(self.mol.E_nuc),
+            'E_total': float(self.E_total),
+            'time': self.end_time - self.start_time
+        })
@@ -0,0 +1,121 @@
+"""
+Sinks for the events a method emits while it runs. Each event is a
+dictionary with an 'event' key of 'start', 'iteration' or 'finish'.
+"""
+import logging
+
+
+class Observer:
+    """
+    Observer of a running method. Subclasses override the events they use.
+    """
+
+    def start(self, method, event):
+        """
+        Called before the integrals are evaluated. event holds the method
+        name and the number of atoms and basis functions.
+        """
+        pass
+
+    def iteration(self, method, event):
+        """
+        Called after every SCF iteration. event holds the iteration number,
+        its wall time, the RMS change of the density, the energy change and
+        the electronic energy.
+        """
+        pass
+
+    def finish(self, method, event):
+        """
+        Called once the SCF stopped. event holds whether it converged, the
+        number of iterations, the energies and the total wall time.
+        """
+        pass
+
+
+class SilentObserver(Observer):
+    """
+    Ignores every event
+    """
+    pass
+
+
+class ConsoleObserver(Observer):
+    """
+    Prints the banner, the iteration table and the summary to stdout with
+    the print methods of the method
+    """
+
+    def start(self, method, event):
+        method.print_start_iterations()
+
+    def iteration(self, method, event):
+        method.print_iteration()
+
+    def finish(self, method, event):
+        if method.converged:
+            method.print_success()
+        elif method.exceeded_iterations:
+            method.print_exceeded_iterations()
+        else:
+            method.print_error()
+
+
+class LoggingObserver(Observer):
+    """
+    Logs every event as a key=value message, with the event dictionary
+    attached to the log record as record.event
+
+    Attributes
+    ----------
+    logger : logging.Logger
+        logger the events are written to
+    level : int
+        level of the iteration events. Start and finish events use the
+        higher of level and INFO.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger('semiempy')
+        self.level = level
+
+    def log(self, level, event):
+        message = ' '.join('{}={}'.format(key, value) for key, value in event.items())
+        self.logger.log(level, message, extra={'event': event})
+
+    def start(self, method, event):
+        self.log(max(self.level, logging.INFO), event)
+
+    def iteration(self, method, event):
+        self.log(self.level, event)
+
+    def finish(self, method, event):
+        self.log(max(self.level, logging.INFO), event)
+
+
+class CallbackObserver(Observer):
+    """
+    Calls functions with the event dictionaries
+
+    Attributes
+    ----------
+    on_start, on_iteration, on_finish : callable
+        functions called with (method, event), or None
+    """
+
+    def __init__(self, on_start=None, on_iteration=None, on_finish=None):
+        self.on_start = on_start
+        self.on_iteration = on_iteration
+        self.on_finish = on_finish
+
+    def start(self, method, event):
+        if self.on_start is not None:
+            self.on_start(method, event)
+
+    def iteration(self, method, event):
+        if self.on_iteration is not None:
+            self.on_iteration(method, event)
+
+    def finish(self, method, event):
+        if self.on_finish is not None:
+            self.on_finish(method, event)
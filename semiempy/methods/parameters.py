@@ -0,0 +1,150 @@
+"""
+Per element parameters of semiempirical methods stored as dense tables
+indexed by atomic number
+"""
+import json
+import numpy as np
+from utils.atom_info import symbols
+
+
+class ElementParameters:
+    """
+    Set of per element parameters. Each parameter is a table indexed by
+    atomic number with NaN for the elements it is not defined for, so the
+    value for every atom or basis function is a single fancy index.
+
+    Attributes
+    ----------
+    name : string
+        name of the parameter set
+    tables : dict
+        table of each parameter. Size of each: (len(symbols),)
+    """
+
+    def __init__(self, values, name=None):
+        """
+        Parameters
+        ----------
+        values : dict
+            for each parameter name a dictionary from chemical symbol or
+            atomic number to value
+        name : string, optional
+            name of the parameter set
+        """
+        self.name = name
+        self.tables = {}
+        for param, table in values.items():
+            self.set(param, table)
+
+    def set(self, param, values):
+        """
+        Sets the values of one parameter, keeping the elements not given
+
+        Parameters
+        ----------
+        param : string
+            parameter name
+        values : dict
+            chemical symbol or atomic number to value
+        """
+        table = self.tables.setdefault(param, np.full(len(symbols), np.nan))
+        for key, value in values.items():
+            table[atomic_number(key)] = value
+
+    def __getitem__(self, param):
+        return self.tables[param]
+
+    def __contains__(self, param):
+        return param in self.tables
+
+    def values(self, param, Z):
+        """
+        Returns the value of a parameter for each atomic number in Z and
+        raises NotImplementedError if any of them is undefined
+        """
+        values = self.tables[param][Z]
+        missing = np.isnan(values)
+        if np.any(missing):
+            raise NotImplementedError(
+                'parameter \'{}\' of {} is not defined for {}'.format(
+                    param, self.name or 'this parameter set',
+                    ', '.join(symbols[z] for z in np.unique(np.asarray(Z)[missing]))))
+        return values
+
+    def updated(self, values, name=None):
+        """
+        Returns a copy with some values replaced
+
+        Parameters
+        ----------
+        values : dict
+            for each parameter name a dictionary from chemical symbol or
+            atomic number to value
+        name : string, optional
+            name of the new set
+        """
+        params = ElementParameters({}, name or self.name)
+        params.tables = {param: table.copy() for param, table in self.tables.items()}
+        for param, table in values.items():
+            params.set(param, table)
+        return params
+
+    def to_dict(self):
+        """
+        Returns the defined values as {param: {symbol: value}}
+        """
+        return {param: {symbols[z]: float(table[z]) for z in np.flatnonzero(~np.isnan(table))}
+                for param, table in self.tables.items()}
+
+    def to_json(self, fname):
+        with open(fname, 'w') as f:
+            json.dump({'name': self.name, 'parameters': self.to_dict()}, f, indent=2)
+
+    @classmethod
+    def from_json(cls, fname):
+        """
+        Reads a parameter set written by to_json. The file holds
+        {"name": ..., "parameters": {param: {symbol: value}}}.
+        """
+        with open(fname) as f:
+            data = json.load(f)
+        return cls(data['parameters'], data.get('name', fname))
+
+
+def atomic_number(key):
+    """
+    Returns the atomic number of a chemical symbol or atomic number
+    """
+    if isinstance(key, str) and not key.isdigit():
+        if key not in symbols:
+            raise NotImplementedError('element \'{}\' is unknown'.format(key))
+        return symbols.index(key)
+    return int(key)
+
+
+def load_parameters(params, parameter_sets):
+    """
+    Returns the parameter set described by params
+
+    Parameters
+    ----------
+    params : ElementParameters, dict or string
+        a parameter set, the values to replace in the first set of
+        parameter_sets, the name of a set in parameter_sets or a json file
+        written by ElementParameters.to_json
+    parameter_sets : dict
+        named parameter sets of a method, the first being the default
+
+    Returns
+    -------
+    params : ElementParameters
+    """
+    if isinstance(params, ElementParameters):
+        return params
+    if params is None:
+        return next(iter(parameter_sets.values()))
+    if isinstance(params, dict):
+        return next(iter(parameter_sets.values())).updated(params, name='custom')
+    if params in parameter_sets:
+        return parameter_sets[params]
+    return ElementParameters.from_json(params)
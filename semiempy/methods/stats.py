@@ -0,0 +1,117 @@
+import contextlib
+import json
+import time
+import numpy as np
+import scipy.sparse as sparse
+
+
+def array_bytes(value):
+    """
+    Returns the memory held by a numpy array, a sparse matrix or a list of
+    them
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sparse.issparse(value):
+        return sum(getattr(value, name).nbytes for name in ('data', 'indices', 'indptr', 'row', 'col')
+                   if hasattr(value, name))
+    if isinstance(value, (list, tuple)):
+        return sum(array_bytes(item) for item in value)
+    return 0
+
+
+class RunStats:
+    """
+    Timings and counters of one run of a method
+
+    Attributes
+    ----------
+    phases : dict
+        for each phase (e.g. 'form_fock') the total wall time in seconds
+        and the number of calls
+    counters : dict
+        event counts, e.g. iterations or integral cache hits
+    array_bytes : int
+        memory held by the arrays of the method at the last sample
+    peak_array_bytes : int
+        largest array_bytes sampled, taken after every phase
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.array_bytes = 0
+        self.peak_array_bytes = 0
+
+    @contextlib.contextmanager
+    def phase(self, name, owner=None):
+        """
+        Context manager adding the time spent inside it to a phase
+
+        Parameters
+        ----------
+        name : string
+            phase name
+        owner : object, optional
+            object whose array attributes are sampled for the peak memory
+            when the phase ends
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            record = self.phases.setdefault(name, {'time': 0.0, 'calls': 0})
+            record['time'] += elapsed
+            record['calls'] += 1
+            if owner is not None:
+                self.sample_memory(owner)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextlib.contextmanager
+    def track_cache(self, cache):
+        """
+        Context manager counting the hits and misses of an integral cache
+        inside it
+        """
+        if cache is None:
+            yield
+            return
+        hits, misses = cache.hits, cache.misses
+        try:
+            yield
+        finally:
+            self.count('integral_cache_hits', cache.hits - hits)
+            self.count('integral_cache_misses', cache.misses - misses)
+
+    def sample_memory(self, owner):
+        """
+        Records the memory held by the array attributes of an object and of
+        the history of its SCF accelerator
+        """
+        n_bytes = sum(array_bytes(value) for value in vars(owner).values())
+        accelerator = getattr(owner, 'accelerator', None)
+        if accelerator is not None:
+            n_bytes += sum(array_bytes(value) for value in vars(accelerator).values())
+        self.array_bytes = n_bytes
+        self.peak_array_bytes = max(self.peak_array_bytes, n_bytes)
+
+    def to_dict(self):
+        return {
+            'phases': {name: dict(record) for name, record in self.phases.items()},
+            'counters': dict(self.counters),
+            'array_bytes': self.array_bytes,
+            'peak_array_bytes': self.peak_array_bytes
+        }
+
+    def to_json(self, fname=None):
+        """
+        Returns the stats as a JSON string, also written to fname if given
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
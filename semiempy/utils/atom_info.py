@@ -3,3 +3,16 @@ nuc = {'H': 1, 'B': 5, 'C': 6, 'N': 7, 'O': 8, 'F': 9,
 
 core_electrons= {'H': 0, 'B': 2, 'C': 2, 'N': 2, 'O': 2, 'F': 2,
          'P': 10, 'S': 10, 'Cl': 10, 'Se': 18, 'Br': 18, 'I': 36}
+
+# chemical symbols indexed by atomic number
+symbols = ['X',
+           'H', 'He',
+           'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
+           'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar',
+           'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn',
+           'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr',
+           'Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd',
+           'In', 'Sn', 'Sb', 'Te', 'I', 'Xe',
+           'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho',
+           'Er', 'Tm', 'Yb', 'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg',
+           'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn']
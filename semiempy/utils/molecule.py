@@ -1,9 +1,9 @@
+import itertools
+import logging
 import numpy as np
-import cclib
-from utils.atom_info import nuc
-from utils.atom_info import core_electrons
-from utils.molecule_utils import distance
-import scipy.constants as sc
+import scipy.spatial as spatial
+from utils.atom_info import nuc, core_electrons, symbols
+from utils.molecule_utils import bohr, distance_matrix, neighbor_distances, coulomb_energy
 
 
 class Molecule:
@@ -14,14 +14,19 @@ class Molecule:
     ----------
     n_atom : int
         number of atoms
-    n_elec : int
-        number of electrons
+    num_elec : int
+        number of electrons, the nuclear charges minus the charge
+    num_val_elec : int
+        number of valence electrons, the core charges minus the charge
     num_elec_core : int
         List of number of core electrons. Size: (n_atom,1)
     charge : int
-        charge on molecule
+        charge on molecule. Defaults to the sum of the formal charges of an
+        sdf record and 0 for other files.
     multiplicity : int
         multiplicity (2S+1) of molecule
+    formal_charges : np.ndarray
+        formal charge of each atom of an sdf record. Size: (n_atom,)
     xyz : float
         xyz coordinates. Size: (n_atom,3)
     symb :
@@ -30,23 +35,79 @@ class Molecule:
         List of atomic numbers. Size: (n_atom,1)
     """
     __accepted_file_formats = ['xyz', 'sdf', 'mol']
+    # largest molecule whose condensed distances, 4 n_atom^2 bytes, are
+    # kept for the nuclear repulsion
+    distance_cache_atoms = 4096
 
-    def __init__(self, fname=None, charge=0, multiplicity=1):
+    def __init__(self, fname=None, charge=None, multiplicity=1):
+        self.charge = 0 if charge is None else charge
+        self.multiplicity = multiplicity
         if fname is not None:
             self.import_file(fname)
-        self.charge = charge
-        self.multplicity = multiplicity
-        self.calculate_E_nuc()
+            if charge is None and hasattr(self, 'formal_charges'):
+                self.charge = int(np.sum(self.formal_charges))
+        if fname is not None:
+            self.calculate_E_nuc()
         return None
 
+    @property
+    def num_elec(self):
+        return int(np.sum(self.at_num)) - self.charge
+
+    @property
+    def num_val_elec(self):
+        return int(np.sum(self.at_num)) - int(np.sum(self.num_elec_core)) - self.charge
+
+    def distances(self, cutoff=None, condensed=False):
+        """
+        Returns the interatomic distances in angstrom. The condensed
+        distances are cached on the molecule until the coordinates change.
+
+        Parameters
+        -----------
+        cutoff : float, optional
+            only return the pairs closer than cutoff angstrom, found with a
+            KD-tree in O(n_atom) time and memory
+        condensed : bool
+            return the n_atom(n_atom-1)/2 pairs i < j instead of the full
+            matrix, see molecule_utils.distance_matrix
+
+        Returns
+        --------
+        r : np.ndarray or tuple
+            distances. Size: (n_atom, n_atom) or (n_atom(n_atom-1)/2,).
+            With a cutoff the tuple (i, j, r) of the pairs i < j.
+        """
+        if cutoff is not None:
+            return neighbor_distances(self.xyz, cutoff)
+        cached = getattr(self, '_distances', None)
+        if cached is None or not np.array_equal(cached[0], self.xyz):
+            cached = (np.array(self.xyz, dtype=float), distance_matrix(self.xyz, condensed=True))
+            self._distances = cached
+        if condensed:
+            return cached[1]
+        return spatial.distance.squareform(cached[1])
+
+    def core_charges(self):
+        """
+        Returns the nuclear charge minus the core electrons of each atom.
+        Size: (n_atom,)
+        """
+        return np.asarray(self.at_num, dtype=float) - np.asarray(self.num_elec_core, dtype=float)
+
     def calculate_E_nuc(self):
-        self.E_nuc = 0.0
-        for i in range(self.n_atom):
-            for j in range(i+1,self.n_atom):
-                Z1 = self.at_num[i] - self.num_elec_core[i]
-                Z2 = self.at_num[j] - self.num_elec_core[j]
-                distance_in_angstroms = distance(self,i,j) * sc.nano * 0.1 / sc.physical_constants["atomic unit of length"][0]
-                self.E_nuc += Z1*Z2/distance_in_angstroms
+        """
+        Calculates the repulsion energy of the atomic cores in hartree from
+        the cached distances. Above distance_cache_atoms atoms the
+        distances are not kept and the energy is summed over blocks of
+        atoms instead.
+        """
+        xyz = np.asarray(self.xyz, dtype=float)/bohr
+        if self.n_atom <= self.distance_cache_atoms:
+            self.E_nuc = coulomb_energy(xyz, self.core_charges(), self.distances(condensed=True)/bohr)
+        else:
+            self.E_nuc = coulomb_energy(xyz, self.core_charges())
+
     def symb2num(self, symb):
         """
         Given a chemical symbol, returns the atomic number defined within the class
@@ -61,11 +122,7 @@ class Molecule:
         at_num : int
             atomic number for symbol argument
         """
-        try:
-            atomic_number = nuc['{}'.format(symb)]
-            return atomic_number
-        except:
-            print('{} is not defined.'.format(symb))
+        return int(element_numbers([symb])[1][0])
 
     def symb2numelec(self, symb):
         """
@@ -83,15 +140,11 @@ class Molecule:
         num_core_elec : int
             number of core electrons
         """
-        try:
-            num_elec = nuc['{}'.format(symb)]
-            num_core_elec = core_electrons['{}'.format(symb)]
-            return num_elec, num_core_elec
-        except:
-            print('{} is not defined.'.format(symb))
+        symb, at_num, num_elec_core = element_numbers([symb])
+        return int(at_num[0]), int(num_elec_core[0])
 
     def import_file(self, fname):
-        filetype = fname.split('.')[1]
+        filetype = fname.rsplit('.', 1)[-1]
         if filetype not in Molecule.__accepted_file_formats:
             parsed_properly = self.import_cclib(fname)
             if not parsed_properly:
@@ -106,7 +159,7 @@ class Molecule:
 
     def import_xyz(self, fname):
         """
-        Imports xyz file as a Molecule class instance
+        Imports the first frame of an xyz file as a Molecule class instance
 
         Parameters
         ----------
@@ -115,31 +168,29 @@ class Molecule:
         """
         self.ftype = 'xyz'
         with open(fname) as f:
-            lines = f.readlines()
-        self.n_atom = int(lines[0].split()[0])
-
-        # reading lines to build up class data
-        self.symb = []
-        self.at_num = []
-        self.num_elec = 0
-        self.num_val_elec = 0
-        self.num_elec_core = []
-        self.xyz = np.zeros((self.n_atom, 3))
-        for i, line in enumerate(lines[2:]):
-            tmp = line.split()
-            self.symb.append(tmp[0])
-            self.at_num.append(self.symb2num(tmp[0]))
-            num_elec_on_atom, num_core_elec_on_atom = self.symb2numelec(tmp[0])
-            self.num_elec += num_elec_on_atom
-            self.num_val_elec += num_elec_on_atom - num_core_elec_on_atom
-            self.num_elec_core.append(num_core_elec_on_atom)
-            self.xyz[i, 0] = float(tmp[1])
-            self.xyz[i, 1] = float(tmp[2])
-            self.xyz[i, 2] = float(tmp[3])
+            symb, xyz, comment = read_xyz_frame(f)
+        self.set_atoms(symb, xyz)
+
+    def set_atoms(self, symb, xyz):
+        """
+        Sets the atoms of the molecule
+
+        Parameters
+        ----------
+        symb : list
+            atomic symbols. Size: (n_atom,1)
+        xyz : np.ndarray
+            xyz coordinates in angstrom. Size: (n_atom,3)
+        """
+        symb, self.at_num, self.num_elec_core = element_numbers(symb)
+        self.n_atom = len(symb)
+        self.symb = symb.tolist()
+        self.xyz = np.array(xyz, dtype=float).reshape(self.n_atom, 3)
 
     def import_sdf(self, fname):
         """
-        Imports xyz file as a Molecule class instance
+        Imports the first record of an sdf or mol file as a Molecule class
+        instance
 
         Parameters
         ----------
@@ -148,31 +199,28 @@ class Molecule:
         """
         self.ftype = 'sdf'
         with open(fname) as f:
-            lines = f.readlines()
-        self.n_atom = int(lines[3].split()[0])
-        self.n_connect = int(lines[3].split()[1])
-        self.symb = []
-        self.at_num = []
-        self.n_place = []
-        self.num_elec = 0
-        self.num_elec_core = []
-        self.xyz = np.zeros((self.n_atom, 3))
-        for i, line in enumerate(lines[4:4+self.n_atom]):
-            tmp = line.split()
-            self.symb.append(tmp[3])
-            self.at_num.append(self.symb2num(tmp[3]))
-            num_elec_on_atom, num_core_elec_on_atom = self.symb2numelec(tmp[3])
-            self.num_elec += num_elec_on_atom
-            self.num_elec_core.append(num_core_elec_on_atom)
-            self.xyz[i, 0] = float(tmp[0])
-            self.xyz[i, 1] = float(tmp[1])
-            self.xyz[i, 2] = float(tmp[2])
-            self.n_place.append(i)
-        self.connect = np.zeros((self.n_connect, 2))
-        for i, line in enumerate(lines[4+self.n_atom:4+self.n_atom+self.n_connect]):
-            tmp = line.split()
-            self.connect[i, 0] = tmp[0]
-            self.connect[i, 1] = tmp[1]
+            record = read_sdf_record(f)
+        if record is None:
+            raise ValueError('{} has no sdf records'.format(fname))
+        name, symb, xyz, connect, formal_charges = record
+        self.set_atoms(symb, xyz)
+        self.set_bonds(connect)
+        self.formal_charges = formal_charges
+
+    def set_bonds(self, connect):
+        """
+        Sets the connectivity of the molecule
+
+        Parameters
+        ----------
+        connect : np.ndarray
+            first atom, second atom (counted from 1) and bond type of each
+            bond. Size: (n_connect,3)
+        """
+        self.n_place = list(range(self.n_atom))
+        self.n_connect = len(connect)
+        self.connect = np.array(connect[:, :2], dtype=float)
+        self.bond_order = np.array(connect[:, 2], dtype=int)
 
     def import_cclib(self, fname):
         """
@@ -184,25 +232,449 @@ class Molecule:
             cclib parsable output file name
         """
         try:
-            self.ftype = 'cclib'
-            data = cclib.io.ccread(fname)
-            self.n_atom = data.natom
-            self.at_num = data.atomnos
-            # This gets the atomic symbols by looking up the keys of the
-            # atomic numbers. It looks somewhat crazy but it is looking
-            # through a list of the values stored in the dictionary,
-            # matching the value to the atomic number and returning
-            # the key that corresponds to that atomic number. It works
-            # with this dictionary because the keys to values are 1 to 1.
-            self.symb = []
-            for i in data.atomnos:
-                self.symb.append(list(nuc.keys())[
-                                list(nuc.values()).index(i)])
-            # cclib stores the atomic coordinates in a array of shape
-            # [molecule, num atoms, 3 for xyz] because I think they might
-            # have many "molecules" from each step of an optimization or
-            # something. Here we are taking just the last one.
-            self.xyz = data.atomcoords[-1]
-            return True
-        except:
+            data = read_cclib(fname)
+        except Exception:
             return False
+        self.ftype = 'cclib'
+        # cclib keeps every geometry of an optimization or scan, the last
+        # one is the final structure
+        self.set_atoms([symbols[Z] for Z in data.atomnos], data.atomcoords[-1])
+        return True
+
+
+def read_cclib(fname):
+    """
+    Parses an output file with cclib
+
+    Parameters
+    ----------
+    fname : string
+        cclib parsable output file name
+
+    Returns
+    -------
+    data : cclib.parser.data.ccData
+        parsed data with at least atomnos and atomcoords
+    """
+    # cclib is slow to import and only needed for its formats
+    import cclib.io
+    data = cclib.io.ccread(fname)
+    if data is None or not hasattr(data, 'atomcoords'):
+        raise NotImplementedError('cclib found no geometries in {}'.format(fname))
+    return data
+
+
+def read_xyz_frame(f):
+    """
+    Reads the next frame from an open xyz file
+
+    Parameters
+    ----------
+    f : file
+        open xyz file positioned at the atom count line of a frame
+
+    Returns
+    -------
+    symb : list
+        atomic symbols. Size: (n_atom,1)
+    xyz : np.ndarray
+        xyz coordinates. Size: (n_atom,3)
+    comment : string
+        comment line of the frame
+
+    Returns None at the end of the file.
+    """
+    line = f.readline()
+    while line and not line.strip():
+        line = f.readline()
+    if not line:
+        return None
+    n_atom = int(line.split()[0])
+    comment = f.readline().rstrip('\n')
+    columns = split_columns(list(itertools.islice(f, n_atom)), 4, n_atom)
+    return columns[0], float_columns(columns[1:4]), comment
+
+
+def read_sdf_record(f):
+    """
+    Reads the next record from an open sdf or mol file in the V2000 format.
+    The lines of the record are read up to the $$$$ line ending it before
+    they are parsed, so a record with wrong counts cannot run into the next
+    one.
+
+    Parameters
+    ----------
+    f : file
+        open sdf file positioned at the name line of a record
+
+    Returns
+    -------
+    record : tuple
+        see parse_sdf_record
+
+    Returns None at the end of the file.
+    """
+    lines = sdf_record_lines(f)
+    if lines is None:
+        return None
+    return parse_sdf_record(lines)
+
+
+def sdf_record_lines(f):
+    """
+    Reads the lines of the next record from an open sdf or mol file, up to
+    and without the $$$$ line ending it or the end of the file
+
+    Returns None at the end of the file.
+    """
+    lines = []
+    for line in f:
+        if line.startswith('$$$$'):
+            return lines
+        lines.append(line)
+    if not any(line.strip() for line in lines):
+        return None
+    return lines
+
+
+def parse_sdf_record(lines):
+    """
+    Parses the lines of a V2000 record. The data items after the bond block
+    are skipped.
+
+    Parameters
+    ----------
+    lines : list
+        lines of the record without the $$$$ line, see sdf_record_lines
+
+    Returns
+    -------
+    name : string
+        name line of the record
+    symb : list
+        atomic symbols. Size: (n_atom,1)
+    xyz : np.ndarray
+        xyz coordinates. Size: (n_atom,3)
+    connect : np.ndarray
+        first atom, second atom (counted from 1) and bond type of each
+        bond. Size: (n_connect,3)
+    formal_charges : np.ndarray
+        formal charge of each atom from the M  CHG lines, or from the atom
+        block when the record has none. Size: (n_atom,)
+    """
+    if len(lines) < 4:
+        raise ValueError('sdf record ended in its header')
+    counts = lines[3]
+    if 'V3000' in counts:
+        raise NotImplementedError('V3000 sdf records are unsupported')
+    # the counts and bond lines are fixed width, so numbers above 99 may touch
+    n_atom = int(counts[0:3])
+    n_connect = int(counts[3:6])
+    symb, xyz, formal_charges = sdf_atom_block(lines[4:4 + n_atom], n_atom)
+    bonds = lines[4 + n_atom:4 + n_atom + n_connect]
+    if len(bonds) < n_connect:
+        raise ValueError('bond block ended after {} of {} lines'.format(len(bonds), n_connect))
+    connect = np.array([(line[0:3], line[3:6], line[6:9]) for line in bonds], dtype=int).reshape(n_connect, 3)
+    charge_lines = []
+    for line in lines[4 + n_atom + n_connect:]:
+        if line.startswith('M  END'):
+            # data items follow
+            break
+        if line.startswith('M  CHG'):
+            charge_lines.append(line)
+    if charge_lines:
+        # the M  CHG lines replace every charge of the atom block
+        formal_charges = np.zeros(n_atom, dtype=int)
+        for line in charge_lines:
+            entries = [int(entry) for entry in line[6:].split()[1:]]
+            formal_charges[np.array(entries[0::2], dtype=int) - 1] = entries[1::2]
+    return lines[0].rstrip('\n'), symb, xyz, connect, formal_charges
+
+
+# formal charge of the charge codes of V2000 atom lines, 4 marks a radical
+sdf_charge_codes = np.array([0, 3, 2, 1, 0, -1, -2, -3])
+
+
+def sdf_atom_block(lines, n_atom):
+    """
+    Reads the atom block of a V2000 record by its fixed columns, x, y and z
+    in characters 0-30, the symbol in 31-34 and the charge code in 36-39,
+    one numpy conversion per column
+
+    Parameters
+    ----------
+    lines : list
+        lines of the atom block
+    n_atom : int
+        number of atoms in the counts line
+
+    Returns
+    -------
+    symb : list
+        atomic symbols. Size: (n_atom,1)
+    xyz : np.ndarray
+        xyz coordinates. Size: (n_atom,3)
+    formal_charges : np.ndarray
+        formal charge of each atom. Size: (n_atom,)
+    """
+    if len(lines) < n_atom:
+        raise ValueError('atom block ended after {} of {} lines'.format(len(lines), n_atom))
+    for i, line in enumerate(lines):
+        if len(line) < 34:
+            raise ValueError('line {} of the atom block is shorter than the V2000 atom line'.format(i + 1))
+    xyz = np.empty((n_atom, 3))
+    for i in range(3):
+        xyz[:, i] = np.array([line[10*i:10*i + 10] for line in lines], dtype=float)
+    symb = [line[31:34].strip() for line in lines]
+    codes = np.array([line[36:39].strip() or '0' for line in lines], dtype=int)
+    if np.any((codes < 0) | (codes > 7)):
+        raise ValueError('atom block has charge codes outside 0-7')
+    return symb, xyz, sdf_charge_codes[codes]
+
+
+def split_columns(lines, n_col, n_row=None):
+    """
+    Splits a block of whitespace separated lines into columns of strings
+    with one split of the whole block
+
+    Parameters
+    ----------
+    lines : list
+        lines of the block
+    n_col : int
+        number of leading columns to keep. Extra columns are ignored.
+    n_row : int, optional
+        expected number of lines, checked to catch truncated files
+
+    Returns
+    -------
+    columns : list
+        n_col lists with the column entries of every line
+    """
+    if n_row is not None and len(lines) < n_row:
+        raise ValueError('block ended after {} of {} lines'.format(len(lines), n_row))
+    tokens = ' '.join(lines).split()
+    if len(tokens) != n_col*len(lines):
+        # some lines have extra columns
+        rows = [line.split() for line in lines]
+        for i, row in enumerate(rows):
+            if len(row) < n_col:
+                raise ValueError('line {} of the block has {} of {} columns'.format(i + 1, len(row), n_col))
+        tokens = [entry for row in rows for entry in row[:n_col]]
+    return [tokens[i::n_col] for i in range(n_col)]
+
+
+def float_columns(columns):
+    """
+    Returns columns of number strings as a float array. Size: (n_row, n_col)
+    """
+    table = np.empty((len(columns[0]), len(columns)))
+    for i, column in enumerate(columns):
+        table[:, i] = np.array(column, dtype=float)
+    return table
+
+
+def element_numbers(symb):
+    """
+    Maps chemical symbols to atomic numbers and core electron counts with
+    one dictionary lookup per distinct element. Symbols are matched case
+    insensitively and atomic numbers are accepted in place of symbols.
+
+    Parameters
+    ----------
+    symb : list or np.ndarray
+        chemical symbols. Size: (n_atom,)
+
+    Returns
+    -------
+    symb : np.ndarray
+        normalized chemical symbols. Size: (n_atom,)
+    at_num : np.ndarray
+        atomic numbers. Size: (n_atom,)
+    num_elec_core : np.ndarray
+        number of core electrons. Size: (n_atom,)
+    """
+    symb = np.asarray(symb, dtype=str).reshape(-1)
+    unique, inverse = np.unique(symb, return_inverse=True)
+    names = []
+    for s in unique:
+        if s.isdigit() and int(s) < len(symbols):
+            s = symbols[int(s)]
+        names.append(s.capitalize())
+    unsupported = sorted(set(name for name in names if name not in nuc))
+    if unsupported:
+        raise NotImplementedError('element(s) {} are not supported. Supported elements: {}'.format(
+            ', '.join(unsupported), ', '.join(nuc)))
+    names = np.array(names)
+    at_num = np.array([nuc[name] for name in names], dtype=int)
+    num_elec_core = np.array([core_electrons[name] for name in names], dtype=int)
+    return names[inverse], at_num[inverse], num_elec_core[inverse]
+
+
+def iter_xyz_frames(fname, charge=0, multiplicity=1):
+    """
+    Lazily reads every frame of a (multi-frame) xyz file, e.g. an MD
+    trajectory or a conformer ensemble, one frame in memory at a time
+
+    Parameters
+    ----------
+    fname : string
+        xyz filename
+    charge : int
+        charge on each molecule
+    multiplicity : int
+        multiplicity (2S+1) of each molecule
+
+    Yields
+    ------
+    mol : Molecule
+        molecule of each frame with the frame comment in mol.comment
+    """
+    with open(fname) as f:
+        while True:
+            frame = read_xyz_frame(f)
+            if frame is None:
+                return
+            symb, xyz, comment = frame
+            mol = Molecule(charge=charge, multiplicity=multiplicity)
+            mol.ftype = 'xyz'
+            mol.comment = comment
+            mol.set_atoms(symb, xyz)
+            mol.calculate_E_nuc()
+            yield mol
+
+
+def read_sdf_records(fname, charge=None, multiplicity=1):
+    """
+    Lazily reads every record of a (multi-record) sdf file, e.g. a compound
+    library, one record in memory at a time. A record that cannot be read
+    is yielded with its error, so one bad record does not end the file.
+
+    Parameters
+    ----------
+    fname : string
+        sdf or mol filename
+    charge : int, optional
+        charge on each molecule. Defaults to the formal charges of each
+        record.
+    multiplicity : int
+        multiplicity (2S+1) of each molecule
+
+    Yields
+    ------
+    name : string
+        name line of the record
+    mol : Molecule or None
+        molecule of the record with the record name in mol.comment
+    error : string or None
+        why the record could not be read
+    """
+    with open(fname) as f:
+        while True:
+            lines = sdf_record_lines(f)
+            if lines is None:
+                return
+            name = lines[0].rstrip('\n')
+            try:
+                record = parse_sdf_record(lines)
+            except Exception as e:
+                # the error stays inside its own record
+                yield name, None, '{}: {}'.format(type(e).__name__, e)
+                continue
+            try:
+                yield name, sdf_molecule(record, charge, multiplicity), None
+            except Exception as e:
+                yield name, None, '{}: {}'.format(type(e).__name__, e)
+
+
+def iter_sdf_records(fname, charge=None, multiplicity=1, skipped=None):
+    """
+    Lazily reads the molecules of every record of a (multi-record) sdf
+    file. Records that cannot be read, e.g. with unsupported elements, are
+    skipped and logged as warnings of the 'semiempy' logger.
+
+    Parameters
+    ----------
+    fname : string
+        sdf or mol filename
+    charge : int, optional
+        charge on each molecule. Defaults to the formal charges of each
+        record.
+    multiplicity : int
+        multiplicity (2S+1) of each molecule
+    skipped : list, optional
+        list the (record index, name, error) of each skipped record is
+        appended to
+
+    Yields
+    ------
+    mol : Molecule
+        molecule of each record with the record name in mol.comment and
+        its index in the file in mol.record
+    """
+    for i, (name, mol, error) in enumerate(read_sdf_records(fname, charge, multiplicity)):
+        if mol is None:
+            logging.getLogger('semiempy').warning('skipped record %d (%s) of %s: %s', i, name, fname, error)
+            if skipped is not None:
+                skipped.append((i, name, error))
+            continue
+        mol.record = i
+        yield mol
+
+
+def iter_cclib_frames(fname, charge=0, multiplicity=1):
+    """
+    Lazily builds a molecule for every geometry in a cclib parsable output,
+    e.g. the steps of a geometry optimization or the points of a scan. cclib
+    parses the whole file up front, the molecules are made one at a time.
+
+    Parameters
+    ----------
+    fname : string
+        cclib parsable output file name
+    charge : int
+        charge on each molecule
+    multiplicity : int
+        multiplicity (2S+1) of each molecule
+
+    Yields
+    ------
+    mol : Molecule
+        molecule of each geometry with the SCF energy of the output in eV in
+        mol.comment, when the output has one per geometry
+    """
+    data = read_cclib(fname)
+    symb = [symbols[Z] for Z in data.atomnos]
+    atomcoords = np.asarray(data.atomcoords)
+    energies = getattr(data, 'scfenergies', None)
+    if energies is not None and len(energies) != len(atomcoords):
+        energies = None
+    # only the geometries and energies are kept while the frames are run,
+    # not the orbitals and everything else cclib parsed
+    del data
+    for i, xyz in enumerate(atomcoords):
+        mol = Molecule(charge=charge, multiplicity=multiplicity)
+        mol.ftype = 'cclib'
+        mol.comment = None if energies is None else 'scfenergy {:.10f} eV'.format(energies[i])
+        mol.set_atoms(symb, xyz)
+        mol.calculate_E_nuc()
+        yield mol
+
+
+def sdf_molecule(record, charge=None, multiplicity=1):
+    """
+    Returns the Molecule of a record from read_sdf_record with the record
+    name in mol.comment. The charge defaults to the formal charges of the
+    record.
+    """
+    name, symb, xyz, connect, formal_charges = record
+    if charge is None:
+        charge = int(np.sum(formal_charges))
+    mol = Molecule(charge=charge, multiplicity=multiplicity)
+    mol.ftype = 'sdf'
+    mol.comment = name
+    mol.set_atoms(symb, xyz)
+    mol.set_bonds(connect)
+    mol.formal_charges = formal_charges
+    mol.calculate_E_nuc()
+    return mol
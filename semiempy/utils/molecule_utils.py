@@ -2,7 +2,12 @@
 Various math utils for functions
 """
 import numpy as np
+import scipy.spatial as spatial
 
+# bohr radius in angstrom, the same value pyscf uses so both backends agree
+bohr = 0.52917721092
+# number of pair distances held in memory at once by the blocked loops
+block_pairs = 2**22
 
 
 def distance(molecule, atomi, atomj):
@@ -26,3 +31,117 @@ def distance(molecule, atomi, atomj):
     z = molecule.xyz[atomi][2] - molecule.xyz[atomj][2]
     rij = np.sqrt((x ** 2) + (y ** 2) + (z ** 2))
     return rij
+
+
+def neighbor_list(xyz, cutoff):
+    """
+    Returns all pairs of points closer than a cutoff using a KD-tree, in
+    O(N) time for a fixed density of points
+
+    Parameters
+    -----------
+    xyz : np.ndarray
+        coordinates. Size: (n, 3)
+    cutoff : float
+        distance cutoff in the units of xyz
+
+    Returns
+    --------
+    i, j : np.ndarray
+        indices of each pair with i < j
+    """
+    pairs = spatial.cKDTree(xyz).query_pairs(cutoff, output_type='ndarray')
+    return pairs[:, 0], pairs[:, 1]
+
+
+def distance_matrix(xyz, condensed=False):
+    """
+    Returns the distances between all pairs of points
+
+    Parameters
+    -----------
+    xyz : np.ndarray
+        coordinates. Size: (n, 3)
+    condensed : bool
+        return only the n(n-1)/2 pairs i < j in the order of
+        scipy.spatial.distance.pdist instead of the full matrix
+
+    Returns
+    --------
+    r : np.ndarray
+        distances in the units of xyz. Size: (n, n) or (n(n-1)/2,)
+    """
+    r = spatial.distance.pdist(np.asarray(xyz, dtype=float))
+    if condensed:
+        return r
+    return spatial.distance.squareform(r)
+
+
+def neighbor_distances(xyz, cutoff):
+    """
+    Returns the distances between all pairs of points closer than a
+    cutoff, in O(N) time and memory for a fixed density of points
+
+    Parameters
+    -----------
+    xyz : np.ndarray
+        coordinates. Size: (n, 3)
+    cutoff : float
+        distance cutoff in the units of xyz
+
+    Returns
+    --------
+    i, j : np.ndarray
+        indices of each pair with i < j
+    r : np.ndarray
+        distance of each pair
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    i, j = neighbor_list(xyz, cutoff)
+    r = np.sqrt(np.sum((xyz[i] - xyz[j])**2, axis=1))
+    return i, j, r
+
+
+def coulomb_energy(xyz, charges, r=None):
+    """
+    Returns the Coulomb energy sum_i<j q_i q_j / r_ij of point charges,
+    summed over blocks of rows so memory stays bounded for large n
+
+    Parameters
+    -----------
+    xyz : np.ndarray
+        coordinates in bohr. Size: (n, 3)
+    charges : np.ndarray
+        charges. Size: (n,)
+    r : np.ndarray, optional
+        precomputed condensed distances in bohr, see distance_matrix.
+        Size: (n(n-1)/2,)
+
+    Returns
+    --------
+    E : float
+        Coulomb energy in hartree
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    charges = np.asarray(charges, dtype=float)
+    n = len(charges)
+    if r is not None:
+        # row i of the condensed distances holds the pairs (i, j > i)
+        E = 0.0
+        start = 0
+        for i in range(n - 1):
+            stop = start + n - 1 - i
+            E += charges[i] * (charges[i+1:] @ (1.0/r[start:stop]))
+            start = stop
+        return E
+    step = max(1, block_pairs // max(n, 1))
+    E = 0.0
+    for start in range(0, n, step):
+        stop = min(n, start + step)
+        # pairs within the block, then the block against all later points
+        q = charges[start:stop]
+        i, j = np.triu_indices(stop - start, k=1)
+        E += np.sum(q[i] * q[j] / spatial.distance.pdist(xyz[start:stop]))
+        r = spatial.distance.cdist(xyz[start:stop], xyz[stop:])
+        E += q @ (1.0/r) @ charges[stop:]
+    return E
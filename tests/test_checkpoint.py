@@ -0,0 +1,39 @@
+"""
+An SCF restarted from a checkpoint has to reach the same ground state
+"""
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from systems import make_molecule
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from methods.CNDO import CNDO
+
+
+def make_calc(mol):
+    calc = CNDO(mol, MinimalNoCore(mol, num_gaussians=3))
+    calc.observers = []
+    return calc
+
+
+def test_restart_reaches_reference(tmp_path):
+    mol = make_molecule("water", 4)
+    reference = make_calc(mol)
+    reference.run()
+    assert reference.converged
+
+    fname = str(tmp_path / 'water4.chk')
+    stopped = make_calc(mol)
+    stopped.checkpoint_file = fname
+    stopped.iteration_max = 3
+    stopped.run()
+    assert not stopped.converged
+
+    restarted = make_calc(mol)
+    restarted.run(restart=fname)
+    assert restarted.converged
+    assert restarted.iteration_num > 3
+    # the integrals are memory mapped from the checkpoint
+    assert isinstance(restarted.S, np.memmap)
+    assert restarted.E_total == pytest.approx(reference.E_total, abs=1e-8)
@@ -0,0 +1,48 @@
+"""
+Density solvers have to reach the same ground state as diagonalization
+"""
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from systems import make_molecule
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from methods.CNDO import CNDO
+from methods.density import sp2_purification
+
+
+def run(mol, density_solver, **options):
+    calc = CNDO(mol, MinimalNoCore(mol, num_gaussians=3))
+    calc.observers = []
+    calc.density_solver = density_solver
+    for key, value in options.items():
+        setattr(calc, key, value)
+    calc.run()
+    return calc
+
+
+@pytest.mark.parametrize("density_solver", ["occupied", "purification"])
+def test_density_solvers_agree(density_solver):
+    mol = make_molecule("graphene", 2)
+    reference = run(mol, "eigh")
+    calc = run(mol, density_solver)
+    assert calc.converged
+    assert calc.E_total == pytest.approx(reference.E_total, abs=1e-8)
+
+
+def test_sp2_reports_unconverged():
+    rng = np.random.default_rng(0)
+    A = rng.normal(size=(40, 40))
+    F = A + A.T
+    D, n_iter, converged = sp2_purification(F, 20, max_iter=3)
+    assert not converged
+    D, n_iter, converged = sp2_purification(F, 20)
+    assert converged
+    assert np.trace(D - D @ D) == pytest.approx(0.0, abs=1e-8)
+
+
+def test_purification_max_iter_raises():
+    mol = make_molecule("graphene", 2)
+    with pytest.raises(RuntimeError, match='purification'):
+        run(mol, "purification", purification_max_iter=8)
@@ -0,0 +1,72 @@
+"""
+The numpy integral engine has to agree with the pyscf backend
+"""
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from systems import make_molecule
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from integrals import numpy_integrals, gaussian_integrals
+from integrals.cache import IntegralCache
+from utils.molecule_utils import bohr
+
+systems = [("water", 4), ("alkane", 3), ("graphene", 1)]
+cutoff = 3.0
+
+
+@pytest.fixture(scope="module", params=systems, ids=["{}{}".format(*s) for s in systems])
+def reference(request):
+    mol = make_molecule(*request.param)
+    bas = MinimalNoCore(mol, num_gaussians=3)
+    return bas, gaussian_integrals.overlap_matrix(bas), gaussian_integrals.gamma_matrix(bas)
+
+
+def atom_distances(xyz):
+    return np.sqrt(np.sum((xyz[:, None, :] - xyz[None, :, :])**2, axis=-1))
+
+
+def test_overlap(reference):
+    bas, S, gamma = reference
+    np.testing.assert_allclose(numpy_integrals.overlap_matrix(bas), S, rtol=0, atol=1e-10)
+
+
+def test_overlap_cutoff(reference):
+    bas, S, gamma = reference
+    # pairs beyond the cutoff are dropped, the others are exact
+    r = atom_distances(bas.compact.pos)
+    S_ref = np.where(r < cutoff, S, 0.0)
+    S_cut = numpy_integrals.overlap_matrix(bas, cutoff=cutoff)
+    np.testing.assert_allclose(S_cut.toarray(), S_ref, rtol=0, atol=1e-10)
+
+
+def test_overlap_cache(reference):
+    bas, S, gamma = reference
+    cache = IntegralCache()
+    for i in range(2):
+        # the second call is served from the cache
+        np.testing.assert_allclose(numpy_integrals.overlap_matrix(bas, cache=cache), S, rtol=0, atol=1e-10)
+    assert cache.hits > 0
+
+
+def test_gamma(reference):
+    bas, S, gamma = reference
+    np.testing.assert_allclose(numpy_integrals.gamma_matrix(bas), gamma, rtol=0, atol=1e-10)
+
+
+def test_gamma_cutoff(reference):
+    bas, S, gamma = reference
+    # pairs beyond the cutoff take the point charge limit 1/R
+    r = atom_distances(bas.mol.xyz)
+    with np.errstate(divide='ignore'):
+        gamma_ref = np.where(r < cutoff, gamma, bohr/r)
+    np.testing.assert_allclose(numpy_integrals.gamma_matrix(bas, cutoff=cutoff), gamma_ref, rtol=0, atol=1e-10)
+
+
+def test_gamma_cache(reference):
+    bas, S, gamma = reference
+    cache = IntegralCache()
+    for i in range(2):
+        np.testing.assert_allclose(numpy_integrals.gamma_matrix(bas, cache=cache), gamma, rtol=0, atol=1e-10)
+    assert cache.hits > 0
@@ -0,0 +1,117 @@
+"""
+Structure file parsers
+"""
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semiempy"))
+from utils.molecule import Molecule, read_sdf_records, iter_sdf_records, sdf_atom_block, element_numbers
+from utils.molecule_utils import bohr, coulomb_energy
+
+
+def sdf_record(name, atoms, bonds, n_connect=None):
+    """
+    Returns the text of a V2000 record, n_connect overrides the bond count
+    of the counts line
+    """
+    lines = [name, '  semiempy', '']
+    lines.append('{:3d}{:3d}  0  0  0  0  0  0  0  0999 V2000'.format(
+        len(atoms), len(bonds) if n_connect is None else n_connect))
+    for symb, (x, y, z) in atoms:
+        lines.append('{:10.4f}{:10.4f}{:10.4f} {:<3s} 0  0  0  0  0  0  0  0  0  0  0  0'.format(x, y, z, symb))
+    for i, j in bonds:
+        lines.append('{:3d}{:3d}  1  0'.format(i, j))
+    lines += ['M  END', '$$$$']
+    return '\n'.join(lines) + '\n'
+
+
+water = [('O', (0.0, 0.0, 0.0)), ('H', (0.757, 0.0, -0.586)), ('H', (-0.757, 0.0, -0.586))]
+water_bonds = [(1, 2), (1, 3)]
+
+
+def test_bad_record_does_not_swallow_the_next(tmp_path):
+    fname = str(tmp_path / 'library.sdf')
+    with open(fname, 'w') as f:
+        f.write(sdf_record('first', water, water_bonds))
+        # the counts line claims more bonds than the record has
+        f.write(sdf_record('broken', water, water_bonds, n_connect=5))
+        f.write(sdf_record('third', water, water_bonds))
+        f.write(sdf_record('fourth', water, water_bonds))
+    records = list(read_sdf_records(fname))
+    assert [name for name, mol, error in records] == ['first', 'broken', 'third', 'fourth']
+    assert [error is None for name, mol, error in records] == [True, False, True, True]
+    skipped = []
+    mols = list(iter_sdf_records(fname, skipped=skipped))
+    assert [mol.comment for mol in mols] == ['first', 'third', 'fourth']
+    assert [mol.record for mol in mols] == [0, 2, 3]
+    assert [(i, name) for i, name, error in skipped] == [(1, 'broken')]
+    np.testing.assert_allclose(mols[2].xyz, np.array([xyz for symb, xyz in water]))
+
+
+def test_v2000_atom_block_fixed_columns():
+    # the charge code 5 is a formal charge of -1 and 3 one of +1
+    lines = ['   -1.2345  123.4567   -0.0001 Cl  0  5  0  0  0  0\n',
+             '    0.0000    0.0000    0.0000 C   0  3  0  0  0  0\n']
+    symb, xyz, formal_charges = sdf_atom_block(lines, 2)
+    assert symb == ['Cl', 'C']
+    np.testing.assert_allclose(xyz, [[-1.2345, 123.4567, -0.0001], [0.0, 0.0, 0.0]])
+    np.testing.assert_array_equal(formal_charges, [-1, 1])
+
+
+def test_counts_above_99(tmp_path):
+    # 120 atoms and 119 bonds make the fields of the counts line touch
+    atoms = [('C', (1.5*i, 0.0, 0.0)) for i in range(120)]
+    bonds = [(i, i + 1) for i in range(1, 120)]
+    text = sdf_record('chain', atoms, bonds)
+    assert text.split('\n')[3].startswith('120119')
+    fname = str(tmp_path / 'chain.sdf')
+    with open(fname, 'w') as f:
+        f.write(text)
+    mol = Molecule(fname)
+    assert mol.n_atom == 120
+    assert mol.n_connect == 119
+    np.testing.assert_allclose(mol.xyz[:, 0], 1.5*np.arange(120))
+    np.testing.assert_array_equal(mol.connect[-1], [119, 120])
+
+
+def test_truncated_atom_block():
+    lines = ['    0.0000    0.0000    0.0000 O   0  0  0  0  0  0\n',
+             '    0.7570    0.0000   -0.5860 H   0  0  0  0  0  0\n']
+    with pytest.raises(ValueError):
+        sdf_atom_block(lines, 3)
+    with pytest.raises(ValueError):
+        # the symbol column is cut off
+        sdf_atom_block([lines[0], lines[1][:25] + '\n'], 2)
+
+
+def test_truncated_xyz_frame(tmp_path):
+    fname = str(tmp_path / 'water.xyz')
+    with open(fname, 'w') as f:
+        f.write('3\nwater\nO 0.0 0.0 0.0\nH 0.757 0.0 -0.586\n')
+    with pytest.raises(ValueError):
+        Molecule(fname)
+
+
+def test_unsupported_elements():
+    with pytest.raises(NotImplementedError, match='Xe'):
+        element_numbers(['C', 'Xe', 'H'])
+    symb, at_num, num_elec_core = element_numbers(['c', '8', 'H'])
+    assert list(symb) == ['C', 'O', 'H']
+    assert list(at_num) == [6, 8, 1]
+
+
+def test_E_nuc_from_cached_distances():
+    mol = Molecule()
+    mol.set_atoms([symb for symb, xyz in water], [xyz for symb, xyz in water])
+    mol.calculate_E_nuc()
+    charges = mol.core_charges()
+    r = mol.distances()/bohr
+    i, j = np.triu_indices(mol.n_atom, k=1)
+    assert mol.E_nuc == pytest.approx(np.sum(charges[i]*charges[j]/r[i, j]), rel=1e-14)
+    np.testing.assert_allclose(mol.distances(condensed=True), r[i, j]*bohr)
+    # moving an atom invalidates the cached distances
+    mol.xyz[1, 0] += 1.0
+    mol.calculate_E_nuc()
+    assert mol.E_nuc == pytest.approx(coulomb_energy(mol.xyz/bohr, charges), rel=1e-14)
+    assert mol.distances()[0, 1] == pytest.approx(np.linalg.norm(mol.xyz[1]))
@@ -0,0 +1,41 @@
+"""
+Every SCF accelerator and initial guess has to reach the same ground state
+"""
+import itertools
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from systems import make_molecule
+from basis.minimal_gaussian_basis_no_core import MinimalNoCore
+from methods.CNDO import CNDO
+
+accelerators = [None, "diis", "ediis"]
+guesses = ["zero", "sad", "huckel"]
+
+
+def run(system, size, accelerator, guess):
+    mol = make_molecule(system, size)
+    calc = CNDO(mol, MinimalNoCore(mol, num_gaussians=3))
+    calc.observers = []
+    calc.scf_accelerator = accelerator
+    calc.guess = guess
+    calc.iteration_max = 200
+    calc.run()
+    return calc
+
+
+@pytest.mark.parametrize("system, size", [("alkane", 3), ("graphene", 1), ("water", 4)])
+def test_accelerators_and_guesses_agree(system, size):
+    energies = {}
+    for accelerator, guess in itertools.product(accelerators, guesses):
+        calc = run(system, size, accelerator, guess)
+        assert calc.converged, (accelerator, guess)
+        # the converged density has to commute with its own Fock matrix
+        calc.form_fock()
+        assert np.max(np.abs(calc.scf_error())) < 1e-4, (accelerator, guess)
+        energies[(accelerator, guess)] = calc.E_total
+    reference = energies[(None, "zero")]
+    for key, E in energies.items():
+        assert E == pytest.approx(reference, abs=1e-6), key